@@ -6,6 +6,8 @@ if PY2:
     from ConfigParser import ConfigParser
     from StringIO import StringIO
     import cPickle as pickle
+    import Queue as queue
+    import SocketServer as socketserver
     import __builtin__ as builtins
 
     basestring = basestring
@@ -17,6 +19,8 @@ else:
     from configparser import ConfigParser
     from io import StringIO
     import pickle as pickle
+    import queue
+    import socketserver
     import builtins
 
     basestring = str
@@ -1,6 +1,7 @@
 from .handlers import (
     PrintLayerInfo,
     PrintLog,
+    PrintProfile,
     RememberBestWeights,
     SaveWeights,
     WeightLog,
@@ -12,3 +13,5 @@ from .base import (
     NeuralNet,
     TrainSplit,
     )
+from .export import export_numpy
+from .serve import MicroBatcher
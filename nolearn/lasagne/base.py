@@ -3,9 +3,18 @@ from __future__ import absolute_import
 from .._compat import basestring
 from .._compat import chain_exception
 from .._compat import pickle
+from .._compat import queue
+from collections import deque
 from collections import OrderedDict, Iterable
+from contextlib import contextmanager
+import hashlib
 import itertools
+import multiprocessing
+import os
 from pydoc import locate
+import sys
+import threading
+import traceback
 from warnings import warn
 from time import time
 
@@ -29,6 +38,7 @@ from sklearn.metrics import r2_score
 from sklearn.preprocessing import LabelEncoder
 import theano
 from theano import tensor as T
+from theano.compile import SharedVariable
 
 from . import PrintLog
 from . import PrintLayerInfo
@@ -50,6 +60,65 @@ def _sldict(arr, sl):
         return arr[sl]
 
 
+class _IndexView(object):
+    """A lazy view of the rows `indices` of `data`.  Rows are only
+    read from `data` when the view is indexed.
+    """
+    def __init__(self, data, indices):
+        self.data = data
+        self.indices = np.asarray(indices)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, key):
+        return self.data[self.indices[key]]
+
+    def __array__(self, dtype=None):
+        array = self.data[self.indices]
+        return array if dtype is None else array.astype(dtype)
+
+    @property
+    def shape(self):
+        return (len(self.indices),) + tuple(self.data.shape[1:])
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+
+def _is_out_of_core(arr):
+    if isinstance(arr, dict):
+        return any(_is_out_of_core(v) for v in arr.values())
+    return isinstance(arr, (np.memmap, _IndexView))
+
+
+def _slview(arr, indices, copy=True):
+    """Like :func:`_sldict`, but avoids reading memory-mapped arrays
+    into memory.  For these, contiguous `indices` result in a
+    memory-mapped slice, and other indices in an :class:`_IndexView`.
+    With `copy=False`, in-memory arrays are never copied either, but
+    wrapped in an :class:`_IndexView`.
+    """
+    if isinstance(arr, dict):
+        return {k: _slview(v, indices, copy) for k, v in arr.items()}
+    if copy and not _is_out_of_core(arr):
+        return arr[indices]
+
+    indices = np.asarray(indices)
+    if isinstance(arr, _IndexView):
+        return _IndexView(arr.data, arr.indices[indices])
+    elif (isinstance(arr, np.memmap) and len(indices) and
+          np.all(np.diff(indices) == 1)):
+        return arr[indices[0]:indices[-1] + 1]
+    else:
+        return _IndexView(arr, indices)
+
+
 class Layers(OrderedDict):
     def __getitem__(self, key):
         if isinstance(key, int):
@@ -67,28 +136,170 @@ class Layers(OrderedDict):
         return list(super(Layers, self).values())
 
 
+def _prefetch(iterable, size):
+    """Consume `iterable` in a background thread, keeping up to `size`
+    items ready in a queue.
+    """
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item, exc=None):
+        # Give up when the consumer has gone away:
+        while not stop.is_set():
+            try:
+                items.put((item, exc), timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        # Always hand over `done`, also for errors that aren't an
+        # Exception, like KeyboardInterrupt, or the consumer would wait
+        # for it forever:
+        exc = None
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            exc = e
+        finally:
+            put(done, exc)
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, exc = items.get()
+            if exc is not None:
+                raise exc
+            if item is done:
+                break
+            yield item
+    finally:
+        stop.set()
+
+
+_batch_worker_state = {}
+
+
+def _init_batch_worker(batch_iterator, X, y):
+    _batch_worker_state['args'] = batch_iterator, X, y
+
+
+def _transform_batch(sl, seed):
+    batch_iterator, X, y = _batch_worker_state['args']
+    # Each batch gets its own seed, so that results do not depend on
+    # which worker happens to process which batch:
+    batch_iterator.random = np.random.RandomState(seed)
+    np.random.seed(seed)
+    return batch_iterator._get_batch(X, y, sl)
+
+
 class BatchIterator(object):
-    def __init__(self, batch_size, shuffle=False, seed=42):
+    def __init__(self, batch_size, shuffle=False, seed=42, prefetch=0,
+                 n_workers=0):
+        """
+        :param batch_size: The number of samples per batch.
+        :param shuffle: Whether to shuffle the samples in every call.
+                        With ``True``, `X` and `y` are shuffled in
+                        place.  With ``'indices'``, only a
+                        permutation of sample indices is drawn, and
+                        each batch is gathered from the unchanged
+                        arrays, which also works with read-only and
+                        memory-mapped arrays.
+        :param seed: Seed for the iterator's :attr:`random` state.
+        :param prefetch: If larger than zero, batches (including the
+                         call to :meth:`transform`) are produced in a
+                         background thread, with up to `prefetch`
+                         batches kept ready ahead of the consumer.
+        :param n_workers: If larger than zero, calls to
+                          :meth:`transform` are distributed across a
+                          pool of `n_workers` processes.  Each batch
+                          is transformed with its own seed drawn from
+                          :attr:`random`, which the worker sets for
+                          both :attr:`random` and :mod:`numpy.random`,
+                          so that results are reproducible.  Workers
+                          are forked, so that they share `X` and `y`
+                          with the parent.  Where forking is not
+                          available, like on Windows, the default
+                          start method is used instead, and the
+                          iterator, `X` and `y` are pickled to every
+                          worker when the pool starts.
+        """
         self.batch_size = batch_size
         self.shuffle = shuffle
         self.random = np.random.RandomState(seed)
+        self.prefetch = prefetch
+        self.n_workers = n_workers
 
     def __call__(self, X, y=None):
-        if self.shuffle:
-            self._shuffle_arrays([X, y] if y is not None else [X], self.random)
         self.X, self.y = X, y
+        self.indices = None
+        if self.shuffle == 'indices' or (
+                self.shuffle and (_is_out_of_core(X) or _is_out_of_core(y))):
+            # Memory-mapped data is never shuffled in place:
+            self.indices = self.random.permutation(self.n_samples)
+        elif self.shuffle:
+            self._shuffle_arrays([X, y] if y is not None else [X], self.random)
         return self
 
     def __iter__(self):
+        if getattr(self, 'n_workers', 0):
+            batches = self._iter_batches_parallel()
+        else:
+            batches = self._iter_batches()
+        if getattr(self, 'prefetch', 0):
+            batches = _prefetch(batches, self.prefetch)
+        return batches
+
+    def _iter_batch_indices(self):
         bs = self.batch_size
+        indices = getattr(self, 'indices', None)
         for i in range((self.n_samples + bs - 1) // bs):
             sl = slice(i * bs, (i + 1) * bs)
-            Xb = _sldict(self.X, sl)
-            if self.y is not None:
-                yb = _sldict(self.y, sl)
-            else:
-                yb = None
-            yield self.transform(Xb, yb)
+            if indices is not None:
+                # Sorting the indices within a batch doesn't change
+                # what the batch contains, but makes for sequential
+                # reads when the data is memory-mapped:
+                sl = np.sort(indices[sl])
+            yield sl
+
+    def _get_batch(self, X, y, sl):
+        Xb = _sldict(X, sl)
+        if y is not None:
+            yb = _sldict(y, sl)
+        else:
+            yb = None
+        return self.transform(Xb, yb)
+
+    def _iter_batches(self):
+        for sl in self._iter_batch_indices():
+            yield self._get_batch(self.X, self.y, sl)
+
+    def _iter_batches_parallel(self):
+        # The data is handed to the workers once when the pool starts;
+        # after that, only indices and seeds travel to the workers:
+        pool = _fork_context().Pool(
+            self.n_workers,
+            initializer=_init_batch_worker,
+            initargs=(self, self.X, self.y),
+            )
+        try:
+            pending = deque()
+            for sl in self._iter_batch_indices():
+                seed = self.random.randint(np.iinfo(np.int32).max)
+                pending.append(pool.apply_async(_transform_batch, (sl, seed)))
+                if len(pending) >= 2 * self.n_workers:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+        finally:
+            pool.terminate()
+            pool.join()
 
     @classmethod
     def _shuffle_arrays(cls, arrays, random):
@@ -115,7 +326,7 @@ class BatchIterator(object):
 
     def __getstate__(self):
         state = dict(self.__dict__)
-        for attr in ('X', 'y',):
+        for attr in ('X', 'y', 'indices'):
             if attr in state:
                 del state[attr]
         return state
@@ -128,9 +339,24 @@ def grad_scale(layer, scale):
 
 
 class TrainSplit(object):
-    def __init__(self, eval_size, stratify=True):
+    def __init__(self, eval_size, stratify=True, copy=True):
+        """
+        :param eval_size: The fraction of samples to use for
+                          validation.
+        :param stratify: Whether to stratify the split by class
+                         (ignored for regression).
+        :param copy: If ``False``, the train and validation sets are
+                     returned as lazy views of `X` and `y` that are
+                     backed by index arrays, instead of as copies.
+                     This keeps peak memory during
+                     :meth:`NeuralNet.fit` at the size of the data
+                     set.  :class:`BatchIterator` gathers each batch
+                     from these views, and it shuffles them by
+                     permuting indices.
+        """
         self.eval_size = eval_size
         self.stratify = stratify
+        self.copy = copy
 
     def __call__(self, X, y, net):
         if self.eval_size:
@@ -140,10 +366,11 @@ class TrainSplit(object):
                 kf = StratifiedKFold(y, round(1. / self.eval_size))
 
             train_indices, valid_indices = next(iter(kf))
-            X_train = _sldict(X, train_indices)
-            y_train = _sldict(y, train_indices)
-            X_valid = _sldict(X, valid_indices)
-            y_valid = _sldict(y, valid_indices)
+            copy = getattr(self, 'copy', True)
+            X_train = _slview(X, train_indices, copy)
+            y_train = _slview(y, train_indices, copy)
+            X_valid = _slview(X, valid_indices, copy)
+            y_valid = _slview(y, valid_indices, copy)
         else:
             X_train, y_train = X, y
             X_valid, y_valid = _sldict(X, slice(0,0)), _sldict(y, slice(0,0))
@@ -198,6 +425,634 @@ def objective(layers,
     return loss
 
 
+def _masked_aggregate(aggregate, num_samples):
+    """Returns a version of the `aggregate` function that leaves out
+    all but the first `num_samples` rows of the loss, i.e. the rows
+    of a padded batch that are padding.
+    """
+    def masked_aggregate(loss, weights=None, mode='mean'):
+        if weights is not None:
+            weights = weights[:num_samples]
+        return aggregate(loss[:num_samples], weights, mode)
+    return masked_aggregate
+
+
+def _unpad(predict_proba, y_batch, num_samples):
+    if num_samples is None:
+        return predict_proba, y_batch
+    return ([output[:num_samples] for output in predict_proba],
+            y_batch[:num_samples])
+
+
+def _pad_rows(arr, size):
+    """Pads `arr`, or each array in a dict, to `size` rows by
+    repeating its rows.
+    """
+    if arr is None:
+        return None
+    if isinstance(arr, dict):
+        return {k: _pad_rows(v, size) for k, v in arr.items()}
+    if len(arr) >= size:
+        return arr
+    return arr[np.arange(size) % len(arr)]
+
+
+class _Timer(object):
+    """Sums up the time spent in each phase of an epoch.  Phases can
+    be nested, in which case the time of the inner phase isn't
+    counted for the outer one.  Phases named ``('handlers', name)``
+    are listed under ``'handlers'`` by :meth:`as_dict`.
+    """
+    phases = ('batch_train', 'train_iter', 'batch_valid', 'eval_iter',
+              'custom_scores')
+
+    def __init__(self):
+        self.totals = OrderedDict((name, 0.) for name in self.phases)
+        self._nested = []
+
+    @contextmanager
+    def __call__(self, name):
+        self._nested.append(0.)
+        t0 = time()
+        try:
+            yield
+        finally:
+            elapsed = time() - t0
+            self.add(name, elapsed - self._nested.pop())
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def add(self, name, seconds):
+        self.totals[name] = self.totals.get(name, 0.) + seconds
+
+    def iterate(self, name, iterable):
+        """Yields the items of `iterable`, and counts the time it
+        takes to get each one for phase `name`.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def merge(self, totals):
+        for name, seconds in totals.items():
+            self.add(name, seconds)
+
+    def as_dict(self):
+        timing = {'handlers': {}}
+        for name, seconds in self.totals.items():
+            if isinstance(name, tuple):
+                timing[name[0]][name[1]] = seconds
+            else:
+                timing[name] = seconds
+        return timing
+
+
+def _handler_name(func):
+    return getattr(func, '__name__', None) or func.__class__.__name__
+
+
+class _WeightedMean(object):
+    """Keeps a running, weighted mean of the outputs of a batch
+    function, e.g. the loss and scores of each training batch.
+    """
+    def __init__(self):
+        self.sums = None
+        self.weight = 0
+
+    def add(self, outputs, weight):
+        try:
+            values = np.array(outputs, dtype=np.float64)
+        except ValueError:
+            values = None
+        if values is None or values.ndim != 1:
+            # Some outputs are arrays rather than scalars:
+            values = np.array([np.mean(output) for output in outputs])
+        values *= weight
+        if self.sums is None:
+            self.sums = values
+        else:
+            self.sums += values
+        self.weight += weight
+
+    def mean(self):
+        """Returns the list of mean values, or an empty list if nothing
+        was added.
+        """
+        if not self.weight:
+            return []
+        return list(self.sums / self.weight)
+
+
+def _fill_buffers(buffers, arrays, offset, size):
+    """Copies each of `arrays` into the corresponding buffer in
+    `buffers`, starting at row `offset`.  Buffers are allocated with
+    room for `size` rows when `buffers` is None, and grown when they
+    are too small.  Returns the buffers.
+    """
+    stop = offset + len(arrays[0])
+    if buffers is None:
+        buffers = [np.empty((max(size, stop),) + arr.shape[1:], arr.dtype)
+                   for arr in arrays]
+    elif stop > len(buffers[0]):
+        buffers = [
+            np.concatenate([buf, np.empty(
+                (max(stop, 2 * len(buf)) - len(buf),) + buf.shape[1:],
+                buf.dtype)])
+            for buf in buffers
+            ]
+    for buf, arr in zip(buffers, arrays):
+        buf[offset:stop] = arr
+    return buffers
+
+
+def _collect_outputs(outputs, out, X):
+    """Writes the outputs of each batch, as yielded by e.g.
+    :meth:`NeuralNet.iter_predict_proba`, into `out`, or into arrays
+    allocated for the number of samples in `X`.  Returns a tuple of
+    arrays if the batches' outputs are tuples, and an array otherwise.
+    """
+    if out is None:
+        buffers = None
+        num_samples = _num_samples(X)
+    else:
+        buffers = list(out) if isinstance(out, (list, tuple)) else [out]
+
+    offset = 0
+    for output in outputs:
+        many = isinstance(output, tuple)
+        output = list(output) if many else [output]
+        stop = offset + len(output[0])
+        if out is None:
+            buffers = _fill_buffers(buffers, output, offset, num_samples)
+        else:
+            if stop > min(len(buf) for buf in buffers):
+                raise ValueError(
+                    "The 'out' array has room for {} rows only.".format(
+                        min(len(buf) for buf in buffers)))
+            for buf, arr in zip(buffers, output):
+                buf[offset:stop] = arr
+        offset = stop
+
+    if buffers is None:
+        raise ValueError("Can't predict for zero samples.")
+    output = tuple(buf[:offset] for buf in buffers)
+    return output if many else output[0]
+
+
+def _batch_shape(Xb, yb):
+    if isinstance(Xb, dict):
+        shape = tuple(sorted((k, np.shape(v)) for k, v in Xb.items()))
+    else:
+        shape = np.shape(Xb)
+    return shape, np.shape(yb)
+
+
+def _group_batches(batches, size):
+    """Groups up to `size` consecutive `(Xb, yb)` batches of the same
+    shape into lists.
+    """
+    group = []
+    for Xb, yb in batches:
+        if group and (len(group) == size or
+                      _batch_shape(Xb, yb) != _batch_shape(*group[0])):
+            yield group
+            group = []
+        group.append((Xb, yb))
+    if group:
+        yield group
+
+
+def _stack_batches(group):
+    Xbs, ybs = zip(*group)
+    if isinstance(Xbs[0], dict):
+        Xb = {k: np.stack([X[k] for X in Xbs]) for k in Xbs[0]}
+    else:
+        Xb = np.stack(Xbs)
+    return Xb, np.stack(ybs)
+
+
+def _get_flat_values(params):
+    return np.concatenate(
+        [param.get_value(borrow=True).ravel() for param in params])
+
+
+def _set_flat_values(params, values):
+    offset = 0
+    for param in params:
+        value = param.get_value(borrow=True)
+        param.set_value(
+            values[offset:offset + value.size].reshape(value.shape).astype(
+                value.dtype))
+        offset += value.size
+
+
+def _fork_context():
+    # Workers are forked, so that they start out with the net and its
+    # compiled functions, without pickling them:
+    if hasattr(multiprocessing, 'get_context'):
+        try:
+            return multiprocessing.get_context('fork')
+        except ValueError:
+            # Fork is not available on this platform; the arguments
+            # of the workers are pickled then:
+            pass
+    return multiprocessing
+
+
+def _split_batch(Xb, yb, num):
+    # Splits a batch into `num` shards of consecutive samples:
+    if isinstance(Xb, dict):
+        Xbs = [dict(zip(Xb.keys(), values)) for values in zip(
+            *[np.array_split(v, num) for v in Xb.values()])]
+    else:
+        Xbs = np.array_split(Xb, num)
+    return list(zip(Xbs, np.array_split(yb, num)))
+
+
+def _num_samples(X):
+    return len(list(X.values())[0]) if isinstance(X, dict) else len(X)
+
+
+def _shared_buffer(target, shape, dtype):
+    """Returns an array of `shape` that forked processes can write
+    to: `target` itself if it's a memory-mapped file that's open for
+    writing, else a new array in shared memory.
+    """
+    if target is not None and len(target) < shape[0]:
+        raise ValueError(
+            "The 'out' array has room for {} rows only.".format(len(target)))
+    if isinstance(target, np.memmap) and target.mode in ('r+', 'w+'):
+        return target
+    size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return np.frombuffer(
+        multiprocessing.RawArray('b', size), dtype=dtype).reshape(shape)
+
+
+class _ParallelTrainer(object):
+    """Runs training steps in `n_jobs` processes: this one, and
+    `n_jobs - 1` forked workers that hold a copy of the net.  Each
+    batch is split into shards, one per process, and each process
+    updates its own copy of the parameters.  Every `sync_every`
+    steps, the parameters are averaged through shared memory,
+    weighted by the number of samples that each process trained on.
+    """
+    def __init__(self, net, n_jobs, sync_every=1):
+        self.net = net
+        self.n_jobs = n_jobs
+        self.sync_every = sync_every
+        self.params = net.get_all_params()
+        # The update's hyperparameters, like the learning rate, are
+        # sent along with every batch, so that handlers can change them:
+        self.hyperparams = [
+            value for key, value in sorted(
+                net._get_params_for('update').items())
+            if isinstance(value, SharedVariable)
+            ]
+
+        train_iter = net.train_iter_
+        if isinstance(train_iter, _LazyIterFunc):
+            train_iter.compile()
+
+        size = len(_get_flat_values(self.params))
+        # One row of parameters for each process, and one for their
+        # average:
+        self.values = np.ctypeslib.as_array(
+            multiprocessing.RawArray('d', (n_jobs + 1) * size),
+            ).reshape(n_jobs + 1, size)
+
+        context = _fork_context()
+
+        self.conns = []
+        self.processes = []
+        seeds = np.random.randint(np.iinfo(np.int32).max, size=n_jobs)
+        for index in range(1, n_jobs):
+            conn, worker_conn = context.Pipe()
+            process = context.Process(
+                target=self._work, args=(worker_conn, index, seeds[index]))
+            process.daemon = True
+            process.start()
+            self.conns.append(conn)
+            self.processes.append(process)
+
+        self.steps = 0
+        self.load = False
+        # The number of samples each process trained on since the
+        # parameters were last averaged:
+        self.num_samples = np.zeros(n_jobs)
+
+    def _work(self, conn, index, seed):
+        for layer in self.net.layers_.values():
+            srng = getattr(layer, '_srng', None)
+            if srng is not None and hasattr(srng, 'seed'):
+                srng.seed(int(seed))
+
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            load, hyperparams, Xb, yb, sync = message
+            try:
+                if load:
+                    _set_flat_values(self.params, self.values[-1])
+                for var, value in zip(self.hyperparams, hyperparams):
+                    var.set_value(value)
+                outputs = None
+                if Xb is not None:
+                    outputs = self.net.apply_batch_func(
+                        self.net.train_iter_, Xb, yb)
+                if sync:
+                    self.values[index] = _get_flat_values(self.params)
+                conn.send((outputs, None))
+            except Exception:
+                conn.send((None, traceback.format_exc()))
+
+    def _send(self, shards, sync):
+        hyperparams = [var.get_value() for var in self.hyperparams]
+        for conn, (Xb, yb) in zip(self.conns, shards):
+            if not len(yb):
+                Xb = yb = None
+            conn.send((self.load, hyperparams, Xb, yb, sync))
+        self.load = False
+
+    def _receive(self):
+        results = []
+        for conn in self.conns:
+            outputs, error = conn.recv()
+            if error is not None:
+                raise RuntimeError(
+                    "Training in a worker process failed:\n" + error)
+            results.append(outputs)
+        return results
+
+    def _average(self):
+        self.values[0] = _get_flat_values(self.params)
+        # Processes that didn't train on any samples hold the last
+        # average still, and are left out:
+        weights = self.num_samples
+        if weights.any():
+            self.values[-1] = np.average(
+                self.values[:-1][weights > 0], axis=0,
+                weights=weights[weights > 0])
+        else:
+            self.values[-1] = self.values[0]
+        self.num_samples = np.zeros(self.n_jobs)
+        _set_flat_values(self.params, self.values[-1])
+        self.load = True
+
+    def step(self, Xb, yb):
+        """Runs one training step on the batch, and returns the
+        outputs of ``train_iter_``, averaged over all shards.
+        """
+        self.steps += 1
+        sync = self.steps % self.sync_every == 0
+        shards = _split_batch(Xb, yb, self.n_jobs)
+        self._send(shards[1:], sync)
+        self.num_samples += [len(ys) for Xs, ys in shards]
+
+        outputs = _WeightedMean()
+        if len(shards[0][1]):
+            outputs.add(
+                self.net.apply_batch_func(self.net.train_iter_, *shards[0]),
+                len(shards[0][1]),
+                )
+        for (Xs, ys), shard_outputs in zip(shards[1:], self._receive()):
+            if shard_outputs is not None:
+                outputs.add(shard_outputs, len(ys))
+
+        if sync:
+            self._average()
+        return outputs.mean()
+
+    def sync(self):
+        """Averages the parameters of all processes, unless they were
+        averaged after the last step already.
+        """
+        if self.steps % self.sync_every:
+            self.steps = 0
+            self._send([([], [])] * len(self.conns), True)
+            self._receive()
+            self._average()
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(None)
+            except (IOError, OSError):
+                pass
+        for process in self.processes:
+            process.join()
+
+
+class _AsyncValidator(object):
+    """Validates snapshots of the parameters in a forked worker
+    process, while this one goes on training.  Snapshots are
+    validated in the order in which they're submitted.
+    """
+    def __init__(self, net, valid_sets):
+        self.net = net
+        self.params = net.get_all_params()
+
+        eval_iter = net.eval_iter_
+        if isinstance(eval_iter, _LazyIterFunc):
+            eval_iter.compile()
+
+        context = _fork_context()
+
+        self.conn, worker_conn = context.Pipe()
+        # Not a daemon, so that it can have children of its own, e.g.
+        # the workers of the batch iterator:
+        self.process = context.Process(
+            target=self._work, args=(worker_conn, valid_sets))
+        self.process.start()
+        self.pending = 0
+
+    def _work(self, conn, valid_sets):
+        score_buffers = None
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            values, full = message
+            try:
+                timer = _Timer()
+                t0 = time()
+                _set_flat_values(self.params, values)
+                valid_outputs, custom_scores, score_buffers = (
+                    self.net._validate(*valid_sets[full],
+                                       score_buffers=score_buffers,
+                                       timer=timer))
+                conn.send(((valid_outputs, custom_scores, time() - t0,
+                            timer.totals), None))
+            except Exception:
+                conn.send((None, traceback.format_exc()))
+
+    def submit(self, values, full=True):
+        """Submits a snapshot of the parameters for validation on all
+        of the validation data if `full`, else on the subsample.
+        """
+        self.conn.send((values, full))
+        self.pending += 1
+
+    def receive(self):
+        """Returns the validation outputs, the custom scores, the
+        duration and the time spent in each phase of the validation of
+        the oldest snapshot submitted.
+        """
+        result, error = self.conn.recv()
+        self.pending -= 1
+        if error is not None:
+            raise RuntimeError(
+                "Validation in the worker process failed:\n" + error)
+        return result
+
+    def close(self):
+        if self.pending:
+            # Nobody's waiting for the results anymore:
+            self.process.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except (IOError, OSError):
+                pass
+        self.process.join()
+
+
+class _LazyIterFunc(object):
+    """Stands in for one of the network's compiled functions, e.g.
+    ``train_iter``, and compiles it on first use.
+    """
+    def __init__(self, net, name):
+        self.net = net
+        self.name = name
+        self.func = None
+
+    def __call__(self, *args, **kwargs):
+        return self.compile()(*args, **kwargs)
+
+    def compile(self):
+        if self.func is None:
+            self.func = getattr(self.net, '_create_' + self.name)()
+            setattr(self.net, self.name + '_', self.func)
+        return self.func
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['func'] = None
+        return state
+
+
+def _function_cache_key(inputs, outputs, updates=(), givens=(), **kwargs):
+    """Returns a hash of the function's graph and compilation
+    settings, along with the graph's shared variables in a
+    deterministic order.
+    """
+    if not isinstance(outputs, (list, tuple)):
+        outputs = [outputs]
+    if hasattr(updates, 'items'):
+        updates = updates.items()
+    updates = list(updates)
+    if hasattr(givens, 'items'):
+        givens = givens.items()
+    givens = list(givens)
+    # Shared variables that are only used in 'givens', e.g. the data
+    # of 'shared_data', have to be swapped on load, too:
+    variables = (list(outputs) + [value for target, value in updates] +
+                 [value for var, value in givens])
+    shared = [var for var in theano.gof.graph.inputs(
+        variables + [target for target, value in updates])
+        if isinstance(var, SharedVariable)]
+
+    description = [
+        theano.__version__,
+        sys.version_info[0],
+        theano.config.floatX,
+        theano.config.device,
+        theano.config.mode,
+        theano.config.optimizer,
+        sorted(kwargs.items()),
+        [(getattr(inp, 'name', None),
+          str(getattr(inp, 'variable', inp).type)) for inp in inputs],
+        [shared.index(target) for target, value in updates],
+        [(var.name, str(var.type)) for var, value in givens],
+        theano.printing.debugprint(variables, file='str', print_type=True),
+        ]
+    description = '\n'.join(str(d) for d in description)
+    key = hashlib.sha1(description.encode('utf-8')).hexdigest()
+    return key, shared
+
+
+def _load_cached_function(path, shared, name=None, profile=None):
+    recursionlimit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(recursionlimit, 10000))
+    try:
+        with open(path, 'rb') as f:
+            func, cached_shared = pickle.load(f)
+        if len(cached_shared) != len(shared):
+            return None
+        # Make the function use our own shared variables, i.e. the
+        # network's parameters, instead of the unpickled copies:
+        func_inputs = [inp.variable for inp in func.maker.inputs]
+        swap = {}
+        for var_cached, var in zip(cached_shared, shared):
+            if var_cached.type != var.type:
+                return None
+            if var_cached in func_inputs:
+                swap[var_cached] = var
+        # Profiles aren't pickled along with the function:
+        return func.copy(swap=swap, name=name, profile=profile)
+    except Exception as e:
+        warn("Could not load compiled function from {}: {}".format(path, e))
+    finally:
+        sys.setrecursionlimit(recursionlimit)
+
+
+def _clear_shared(var):
+    # Replaces the value of a tensor's shared variable with an empty
+    # array of the same type:
+    broadcastable = getattr(var, 'broadcastable', None)
+    if broadcastable is None:
+        return
+    var.set_value(np.zeros(
+        [1 if b else 0 for b in broadcastable], dtype=var.dtype))
+
+
+def _save_cached_function(path, func, shared):
+    recursionlimit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(recursionlimit, 10000))
+    tmp_path = '{}-{}.tmp'.format(path, os.getpid())
+    try:
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        # Leave out the values of the shared variables, e.g. the
+        # network's weights, since they're swapped on load anyway:
+        values = [var.get_value(borrow=True) for var in shared]
+        try:
+            for var in shared:
+                _clear_shared(var)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((func, shared), f, -1)
+        finally:
+            for var, value in zip(shared, values):
+                var.set_value(value, borrow=True)
+        os.rename(tmp_path, path)
+    except Exception as e:
+        warn("Could not save compiled function to {}: {}".format(path, e))
+    finally:
+        sys.setrecursionlimit(recursionlimit)
+
+
 class NeuralNet(BaseEstimator):
     """A configurable Neural Network estimator based on Lasagne.
     Compatible with scikit-learn estimators.
@@ -214,6 +1069,13 @@ class NeuralNet(BaseEstimator):
         * train_loss -  The training loss for this epoch
         * valid_loss - The validation loss for this epoch
         * valid_accuracy - The validation accuracy for this epoch
+        * valid_fresh - False if this epoch wasn't validated
+        * dur - The duration of this epoch in seconds
+        * timing - The seconds spent in each phase of this epoch:
+          ``batch_train`` and ``batch_valid`` in the batch iterators,
+          ``train_iter`` and ``eval_iter`` in training and validation
+          steps, ``custom_scores`` in the custom scores, and
+          ``handlers``, a dict of the time spent in each handler
 
     layers_: A dictionary of lasagne layers keyed by the layer's name, or the layer's index
     """
@@ -230,6 +1092,7 @@ class NeuralNet(BaseEstimator):
         max_epochs=100,
         train_split=TrainSplit(eval_size=0.2),
         custom_scores=None,
+        custom_scores_per_epoch=False,
         scores_train=None,
         scores_valid=None,
         X_tensor_type=None,
@@ -241,6 +1104,19 @@ class NeuralNet(BaseEstimator):
         on_training_finished=None,
         more_params=None,
         check_input=True,
+        compile_cache=None,
+        train_steps_per_call=1,
+        shared_data=False,
+        shared_data_chunk_size=None,
+        grad_accumulation_steps=1,
+        n_jobs=1,
+        parallel_sync_every=1,
+        predict_n_jobs=1,
+        async_validation=False,
+        validate_every=1,
+        valid_subsample=None,
+        profile=False,
+        pad_batches=False,
         verbose=0,
         **kwargs
         ):
@@ -308,6 +1184,13 @@ class NeuralNet(BaseEstimator):
             first argument, and the predicted y_values as the second
             argument.
 
+        custom_scores_per_epoch:
+            If true, each of the ``custom_scores`` is called only once
+            per epoch, with the targets and predictions of the whole
+            validation set.  Otherwise, it's called once per batch,
+            and the results are averaged, which is wrong for scores
+            like AUC or F1 that don't decompose over batches.
+
         use_label_encoder:
             If true, all y_values will be encoded using a
             :class:`sklearn.preprocessing.LabelEncoder` instance.
@@ -318,12 +1201,125 @@ class NeuralNet(BaseEstimator):
             Any non-zero value will cause the network to print the
             layer info at the start of training, as well as print a
             log of the training history after each epoch.  Larger
-            values will increase the amount of info shown.
+            values will increase the amount of info shown.  With
+            values larger than 2, the log shows how long each epoch
+            took in each phase of training.
 
         more_params:
             A set of more parameters to use when initializing layers
             defined using the dictionary method.
 
+        compile_cache:
+            Path to a directory in which compiled Theano functions are
+            stored.  When a function with the same graph (i.e. the
+            same architecture, update rule, objective, and tensor
+            types) was compiled before, it is loaded from there
+            instead of being compiled again.  Since compiled functions
+            don't depend on the shapes of parameters, nets that only
+            differ in e.g. the number of units share their cache
+            entries.  With ``verbose``, cache hits and misses are
+            reported.
+
+        train_steps_per_call:
+            If larger than one, up to this many consecutive training
+            batches of the same shape are stacked and passed to a
+            single call of a ``scan``-based training function, which
+            runs one update per batch.  This saves the overhead of
+            calling into Theano for every batch, which matters for
+            small nets.  The ``on_batch_finished`` handlers are called
+            for each of the batches after the call returns.  Note that
+            the state of the update rule, like momentum, isn't shared
+            with the regular training function.
+
+        shared_data:
+            If true, the training and validation data are copied into
+            Theano shared variables once, and the compiled functions
+            only receive the indexes of the samples in each batch.
+            This saves converting and copying the input of every
+            batch.  The batch iterators' ``batch_size`` and
+            ``shuffle`` are respected, but their ``transform`` is
+            never called, so it mustn't be overridden.
+
+        shared_data_chunk_size:
+            With ``shared_data``, the number of samples that are held
+            in shared variables at a time.  Defaults to all of them.
+            Batches are shuffled within each chunk only.
+
+        grad_accumulation_steps:
+            If larger than one, the gradients of this many consecutive
+            training batches are accumulated, and their mean, weighted
+            by the number of samples in each batch, is passed to the
+            ``update`` function once.  This allows for large effective
+            batch sizes with the memory needed for small ones.
+
+        n_jobs:
+            If larger than one, training is data-parallel across this
+            many processes: this one, and workers forked at the start
+            of every epoch, each of which holds a copy of the net.
+            Each training batch is split into ``n_jobs`` shards of
+            equal size, and every process runs ``train_iter_`` on its
+            own shard.  The handlers run in this process.  Requires
+            the ``fork`` start method, i.e. a POSIX system.
+
+        parallel_sync_every:
+            With ``n_jobs``, the number of training steps after which
+            the parameters of all processes are averaged through
+            shared memory.  They're also averaged at the end of every
+            epoch, before validation.  The state of the update rule,
+            like momentum, is kept per process.
+
+        predict_n_jobs:
+            If larger than one, :meth:`predict_proba` splits the data
+            into this many contiguous ranges of batches, and forks
+            workers that write their predictions into shared memory.
+            Independent of ``n_jobs``, which is for training only.
+
+        async_validation:
+            If True, validation runs in a worker process that's forked
+            at the start of training, while this process goes on with
+            the next epoch.  At the end of every epoch, a snapshot of
+            the parameters is sent to the worker.  Once its validation
+            is done, the epoch is added to ``train_history_`` and the
+            ``on_epoch_finished`` handlers are called, with the
+            parameters of the snapshot loaded for as long as they run.
+            Handlers thus see consistent values, but they're called
+            one epoch late, and changes they make to the parameters
+            are lost.  If a handler stops training, the parameters of
+            its epoch are kept.  Requires the ``fork`` start method.
+
+        validate_every:
+            Validate only every this many epochs, and after the last
+            one.  For the other epochs, ``train_history_`` holds NaN
+            for the validation loss and scores, and ``valid_fresh`` is
+            False.
+
+        valid_subsample:
+            If given, all epochs but the last one are validated on a
+            fixed random subsample of the validation data only.  An
+            int is the number of samples, a float the fraction of
+            them.  If a handler stops training early, there's no
+            validation on all of the data.
+
+        profile:
+            If True, all functions, like ``train_iter_``,
+            ``eval_iter_`` and ``predict_iter_``, are compiled with
+            Theano's profiler turned on.  Their profiles are available
+            as their ``profile`` attribute.  Add a
+            :class:`PrintProfile` handler to ``on_training_finished``
+            to print them.  Calls in worker processes, e.g. with
+            ``n_jobs`` or ``predict_n_jobs``, aren't profiled.
+
+        pad_batches:
+            If True, batches that are smaller than the batch
+            iterator's ``batch_size``, usually the last one, are
+            padded to that size by repeating their samples.  Thus,
+            every call to a compiled function sees the same shape.
+            The padding is left out of the loss, the accuracy, the
+            scores and the predictions.  It requires an objective
+            that takes an ``aggregate`` argument, like the default
+            one.  Layers like batch normalization still see the
+            padding in training.
+
         Note
         ----
 
@@ -400,6 +1396,7 @@ class NeuralNet(BaseEstimator):
         self.max_epochs = max_epochs
         self.train_split = train_split
         self.custom_scores = custom_scores
+        self.custom_scores_per_epoch = custom_scores_per_epoch
         self.scores_train = scores_train or []
         self.scores_valid = scores_valid or []
         self.y_tensor_type = y_tensor_type
@@ -410,6 +1407,19 @@ class NeuralNet(BaseEstimator):
         self.on_training_finished = on_training_finished or []
         self.more_params = more_params or {}
         self.check_input = check_input
+        self.compile_cache = compile_cache
+        self.train_steps_per_call = train_steps_per_call
+        self.shared_data = shared_data
+        self.shared_data_chunk_size = shared_data_chunk_size
+        self.grad_accumulation_steps = grad_accumulation_steps
+        self.n_jobs = n_jobs
+        self.parallel_sync_every = parallel_sync_every
+        self.predict_n_jobs = predict_n_jobs
+        self.async_validation = async_validation
+        self.validate_every = validate_every
+        self.valid_subsample = valid_subsample
+        self.profile = profile
+        self.pad_batches = pad_batches
         self.verbose = verbose
         if self.verbose:
             # XXX: PrintLog should come before any other handlers,
@@ -461,8 +1471,9 @@ class NeuralNet(BaseEstimator):
 
     def initialize(self):
         """Initializes the network.  Checks that no extra kwargs were
-        passed to the constructor, and compiles the train, predict,
-        and evaluation functions.
+        passed to the constructor, and sets up the train, predict,
+        and evaluation functions.  Each of these is only compiled when
+        it's first used.
 
         Subsequent calls to this function will return without any action.
         """
@@ -593,28 +1604,44 @@ class NeuralNet(BaseEstimator):
         return [layer]
 
     def _create_iter_funcs(self, layers, objective, update, output_type):
-        y_batch = output_type('y_batch')
-
+        # The functions are only compiled when they're first called;
+        # e.g. a net that's only used for predictions will never build
+        # the gradient and update graph:
+        return (
+            _LazyIterFunc(self, 'train_iter'),
+            _LazyIterFunc(self, 'eval_iter'),
+            _LazyIterFunc(self, 'predict_iter'),
+            )
 
+    def _get_iter_inputs(self, y_batch=None):
+        input_layers = [layer for layer in self.layers_.values()
+                        if isinstance(layer, InputLayer)]
+        inputs = [theano.In(input_layer.input_var, name=input_layer.name)
+                  for input_layer in input_layers]
+        if y_batch is not None:
+            inputs.append(theano.In(y_batch, name="y"))
+        return inputs
+
+    def _get_train_grads(self, y_batch, num_samples=None):
+        # Returns the outputs and gradients of a training step, along
+        # with the parameters that the gradients are for.  With
+        # `num_samples`, rows after the first `num_samples` are
+        # padding, and left out of the loss and scores:
         objective_kw = self._get_params_for('objective')
-
-        loss_train = objective(
-            layers, target=y_batch, **objective_kw)
-        loss_eval = objective(
-            layers, target=y_batch, deterministic=True, **objective_kw)
-
-        output_layer = self._output_layers
-        predict_proba = get_output(output_layer, None, deterministic=True)
-        if not self.regression:
-            predict = predict_proba[0].argmax(axis=1)
-            accuracy = T.mean(T.eq(predict, y_batch))
-        else:
-            accuracy = loss_eval
-
-        scores_train = [
-            s[1](predict_proba, y_batch) for s in self.scores_train]
-        scores_valid = [
-            s[1](predict_proba, y_batch) for s in self.scores_valid]
+        if num_samples is not None:
+            objective_kw['aggregate'] = _masked_aggregate(
+                objective_kw.get('aggregate', aggregate), num_samples)
+        loss_train = self.objective(
+            self.layers_, target=y_batch, **objective_kw)
+
+        scores_train = []
+        if self.scores_train:
+            predict_proba = get_output(
+                self._output_layers, None, deterministic=True)
+            predict_proba, y_true = _unpad(predict_proba, y_batch,
+                                           num_samples)
+            scores_train = [
+                s[1](predict_proba, y_true) for s in self.scores_train]
 
         all_params = self.get_all_params(trainable=True)
         grads = theano.grad(loss_train, all_params)
@@ -622,40 +1649,232 @@ class NeuralNet(BaseEstimator):
             grad_scale = getattr(param.tag, 'grad_scale', 1)
             if grad_scale != 1:
                 grads[idx] *= grad_scale
+        return [loss_train] + scores_train, grads, all_params
+
+    def _get_train_outputs(self, y_batch, num_samples=None):
+        # Returns the outputs and updates of a training step:
+        outputs, grads, all_params = self._get_train_grads(
+            y_batch, num_samples)
         update_params = self._get_params_for('update')
-        updates = update(grads, all_params, **update_params)
+        updates = self.update(grads, all_params, **update_params)
+        return outputs, updates
+
+    def _get_grad_accumulators(self):
+        # Shared variables that sum up the gradients of the batches,
+        # weighted by their number of samples, and that count samples:
+        accumulators = getattr(self, '_grad_accumulators', None)
+        if accumulators is None:
+            sums = [
+                theano.shared(
+                    np.zeros_like(param.get_value()),
+                    broadcastable=param.broadcastable,
+                    )
+                for param in self.get_all_params(trainable=True)
+                ]
+            count = theano.shared(floatX(0.))
+            accumulators = self._grad_accumulators = sums, count
+        return accumulators
+
+    def _create_train_iter_accumulate(self):
+        # Like train_iter, but only accumulates the gradients:
+        y_batch = self.y_tensor_type('y_batch')
+        outputs, grads, all_params = self._get_train_grads(y_batch)
+        sums, count = self._get_grad_accumulators()
+        inputs = self._get_iter_inputs(y_batch)
+        size = T.cast(inputs[0].variable.shape[0], theano.config.floatX)
+        updates = OrderedDict(
+            (grad_sum, grad_sum + size * grad)
+            for grad_sum, grad in zip(sums, grads)
+            )
+        updates[count] = count + size
+        return self._compile_function(
+            'train_iter_accumulate',
+            inputs=inputs,
+            outputs=outputs,
+            updates=updates,
+            allow_input_downcast=True,
+            )
 
-        input_layers = [layer for layer in layers.values()
-                        if isinstance(layer, InputLayer)]
+    def _create_apply_grads(self):
+        # Applies the update with the mean of the accumulated
+        # gradients, and resets the accumulators:
+        sums, count = self._get_grad_accumulators()
+        all_params = self.get_all_params(trainable=True)
+        grads = [grad_sum / count for grad_sum in sums]
+        update_params = self._get_params_for('update')
+        updates = self.update(grads, all_params, **update_params)
+        for grad_sum in sums:
+            updates[grad_sum] = T.zeros_like(grad_sum)
+        updates[count] = T.zeros_like(count)
+        return self._compile_function(
+            'apply_grads',
+            inputs=[],
+            outputs=[],
+            updates=updates,
+            )
 
-        X_inputs = [theano.In(input_layer.input_var, name=input_layer.name)
-                    for input_layer in input_layers]
-        inputs = X_inputs + [theano.In(y_batch, name="y")]
+    def _create_train_iter(self):
+        y_batch = self.y_tensor_type('y_batch')
+        outputs, updates = self._get_train_outputs(y_batch)
+        return self._compile_function(
+            'train_iter',
+            inputs=self._get_iter_inputs(y_batch),
+            outputs=outputs,
+            updates=updates,
+            allow_input_downcast=True,
+            )
 
-        train_iter = theano.function(
-            inputs=inputs,
-            outputs=[loss_train] + scores_train,
+    def _create_train_iter_padded(self):
+        # Like train_iter, but takes the number of samples in the
+        # batch that aren't padding, too:
+        y_batch = self.y_tensor_type('y_batch')
+        num_samples = T.lscalar('num_samples')
+        outputs, updates = self._get_train_outputs(y_batch, num_samples)
+        return self._compile_function(
+            'train_iter_padded',
+            inputs=self._get_iter_inputs(y_batch) + [
+                theano.In(num_samples, name='num_samples')],
+            outputs=outputs,
             updates=updates,
             allow_input_downcast=True,
             )
-        eval_iter = theano.function(
-            inputs=inputs,
-            outputs=[loss_eval, accuracy] + scores_valid,
+
+    def _create_train_iter_steps(self):
+        # Like train_iter, but takes a stack of batches and runs one
+        # training step per batch inside a single call:
+        y_batch = self.y_tensor_type('y_batch')
+        outputs, updates = self._get_train_outputs(y_batch)
+        updates = OrderedDict(updates)
+        inputs = self._get_iter_inputs(y_batch)
+        variables = [input.variable for input in inputs]
+        stacked = [
+            T.TensorType(var.dtype, (False,) + var.broadcastable)(var.name)
+            for var in variables
+            ]
+
+        def step(*batch):
+            replaced = theano.clone(
+                outputs + list(updates.values()),
+                replace=dict(zip(variables, batch)),
+                )
+            return (
+                replaced[:len(outputs)],
+                OrderedDict(zip(updates.keys(), replaced[len(outputs):])),
+                )
+
+        step_outputs, step_updates = theano.scan(step, sequences=stacked)
+        if not isinstance(step_outputs, list):
+            step_outputs = [step_outputs]
+
+        return self._compile_function(
+            'train_iter_steps',
+            inputs=[theano.In(var, name=input.name)
+                    for var, input in zip(stacked, inputs)],
+            outputs=step_outputs,
+            updates=step_updates,
+            allow_input_downcast=True,
+            )
+
+    def _get_eval_outputs(self, y_batch, num_samples=None):
+        objective_kw = self._get_params_for('objective')
+        if num_samples is not None:
+            objective_kw['aggregate'] = _masked_aggregate(
+                objective_kw.get('aggregate', aggregate), num_samples)
+        loss_eval = self.objective(
+            self.layers_, target=y_batch, deterministic=True, **objective_kw)
+
+        predict_proba = get_output(
+            self._output_layers, None, deterministic=True)
+        predict_true, y_true = _unpad(predict_proba, y_batch, num_samples)
+        if not self.regression:
+            predict = predict_true[0].argmax(axis=1)
+            accuracy = T.mean(T.eq(predict, y_true))
+        else:
+            accuracy = loss_eval
+
+        scores_valid = [
+            s[1](predict_true, y_true) for s in self.scores_valid]
+
+        # Custom scores are computed from the predictions in Python;
+        # returning them here saves a second forward pass through
+        # predict_iter_:
+        predictions = list(predict_proba) if self.custom_scores else []
+        return [loss_eval, accuracy] + scores_valid + predictions
+
+    def _create_eval_iter(self):
+        y_batch = self.y_tensor_type('y_batch')
+        return self._compile_function(
+            'eval_iter',
+            inputs=self._get_iter_inputs(y_batch),
+            outputs=self._get_eval_outputs(y_batch),
+            allow_input_downcast=True,
+            )
+
+    def _create_eval_iter_padded(self):
+        y_batch = self.y_tensor_type('y_batch')
+        num_samples = T.lscalar('num_samples')
+        return self._compile_function(
+            'eval_iter_padded',
+            inputs=self._get_iter_inputs(y_batch) + [
+                theano.In(num_samples, name='num_samples')],
+            outputs=self._get_eval_outputs(y_batch, num_samples),
             allow_input_downcast=True,
             )
-        predict_iter = theano.function(
-            inputs=X_inputs,
+
+    def _create_predict_iter(self):
+        predict_proba = get_output(
+            self._output_layers, None, deterministic=True)
+        return self._compile_function(
+            'predict_iter',
+            inputs=self._get_iter_inputs(),
             outputs=predict_proba,
             allow_input_downcast=True,
             )
 
-        return train_iter, eval_iter, predict_iter
+    def _compile_function(self, name, inputs, outputs, updates=None,
+                          **kwargs):
+        """Compile a Theano function, or load it from the
+        :attr:`compile_cache` directory if it was compiled before.
+        """
+        kwargs.update(inputs=inputs, outputs=outputs, name=name)
+        if updates is not None:
+            kwargs['updates'] = updates
+        if getattr(self, 'profile', False):
+            kwargs['profile'] = True
+
+        cache_dir = getattr(self, 'compile_cache', None)
+        if not cache_dir:
+            return theano.function(**kwargs)
+
+        key, shared = _function_cache_key(**kwargs)
+        path = os.path.join(cache_dir, '{}-{}.pkl'.format(name, key))
+
+        func = None
+        if os.path.exists(path):
+            func = _load_cached_function(
+                path, shared, name=name, profile=kwargs.get('profile'))
+        if func is not None:
+            if self.verbose:
+                print("Loaded compiled function '{}' from {}.".format(
+                    name, path))
+            return func
+
+        func = theano.function(**kwargs)
+        _save_cached_function(path, func, shared)
+        if self.verbose:
+            print("Compiled function '{}' and stored it in {}.".format(
+                name, path))
+        return func
 
     def fit(self, X, y, epochs=None):
         """
         Runs the training loop for a given number of epochs
 
-        :param X:  The input data
+        :param X:  The input data.  This can be a :class:`numpy.memmap`
+                   (or a dict of them) for data that doesn't fit into
+                   memory; the default :class:`TrainSplit` and
+                   :class:`BatchIterator` then only ever read single
+                   batches from disk.
         :param y:  The ground truth
         :param epochs: The number of epochs to run, if `None` runs for the
                        network's :attr:`max_epochs`
@@ -704,11 +1923,9 @@ class NeuralNet(BaseEstimator):
         if not isinstance(on_training_finished, (list, tuple)):
             on_training_finished = [on_training_finished]
 
-        epoch = 0
-        best_valid_loss = (
-            min([row['valid_loss'] for row in self.train_history_]) if
-            self.train_history_ else np.inf
-            )
+        valid_losses = [row['valid_loss'] for row in self.train_history_
+                        if row.get('valid_fresh', True)]
+        best_valid_loss = min(valid_losses) if valid_losses else np.inf
         best_train_loss = (
             min([row['train_loss'] for row in self.train_history_]) if
             self.train_history_ else np.inf
@@ -718,104 +1935,477 @@ class NeuralNet(BaseEstimator):
 
         num_epochs_past = len(self.train_history_)
 
-        while epoch < epochs:
-            epoch += 1
+        self._check_train_options()
+        epochs_iter = self._iter_epochs(
+            X_train, y_train, X_valid, y_valid, epochs, on_batch_finished)
 
-            train_outputs = []
-            valid_outputs = []
+        try:
+            for (epoch, dur, train_outputs, valid_outputs, avg_custom_scores,
+                 timer, values) in epochs_iter:
+                if values is not None:
+                    # By now, the parameters are those of a later epoch;
+                    # the handlers get to see the validated ones:
+                    params = self.get_all_params()
+                    current_values = _get_flat_values(params)
+                    _set_flat_values(params, values)
+
+                valid_fresh = valid_outputs is not None
+                if not valid_fresh:
+                    valid_outputs = []
+                    avg_custom_scores = [
+                        np.nan for custom_score in self.custom_scores or ()]
+
+                if train_outputs[0] < best_train_loss:
+                    best_train_loss = train_outputs[0]
+                if valid_outputs and valid_outputs[0] < best_valid_loss:
+                    best_valid_loss = valid_outputs[0]
+
+                if valid_outputs:
+                    valid_loss_best = best_valid_loss == valid_outputs[0]
+                else:
+                    # An epoch that wasn't validated is never the best:
+                    valid_loss_best = np.nan if valid_fresh else False
+
+                info = {
+                    'epoch': num_epochs_past + epoch,
+                    'train_loss': train_outputs[0],
+                    'train_loss_best': best_train_loss == train_outputs[0],
+                    'valid_loss': valid_outputs[0]
+                    if valid_outputs else np.nan,
+                    'valid_loss_best': valid_loss_best,
+                    'valid_accuracy': valid_outputs[1]
+                    if valid_outputs else np.nan,
+                    'valid_fresh': valid_fresh,
+                    'dur': dur,
+                    'timing': timer.as_dict(),
+                    }
+
+                if self.custom_scores and avg_custom_scores:
+                    for index, custom_score in enumerate(self.custom_scores):
+                        info[custom_score[0]] = avg_custom_scores[index]
+
+                if self.scores_train:
+                    for index, (name, func) in enumerate(self.scores_train):
+                        info[name] = train_outputs[index + 1]
+
+                if self.scores_valid:
+                    for index, (name, func) in enumerate(self.scores_valid):
+                        info[name] = (valid_outputs[index + 2]
+                                      if valid_outputs else np.nan)
+
+                self.train_history_.append(info)
+
+                try:
+                    for func in on_epoch_finished:
+                        with timer(('handlers', _handler_name(func))):
+                            func(self, self.train_history_)
+                except StopIteration:
+                    break
+                finally:
+                    info['timing'] = timer.as_dict()
+
+                if values is not None:
+                    _set_flat_values(params, current_values)
+        finally:
+            epochs_iter.close()
+            # Don't hold on to the data in shared variables:
+            for name in ('train', 'valid'):
+                storage = getattr(self, 'shared_{}_'.format(name), {})
+                for var in storage.values():
+                    var.set_value(np.zeros((0,) * var.ndim, dtype=var.dtype))
+            self._shared_loaded = {}
 
-            if self.custom_scores:
-                custom_scores = [[] for _ in self.custom_scores]
-            else:
-                custom_scores = []
-
-            t0 = time()
-
-            batch_train_sizes = []
-            for Xb, yb in self.batch_iterator_train(X_train, y_train):
-                train_outputs.append(
-                    self.apply_batch_func(self.train_iter_, Xb, yb))
-                batch_train_sizes.append(len(Xb))
-
-                for func in on_batch_finished:
-                    func(self, self.train_history_)
-
-            batch_valid_sizes = []
-            for Xb, yb in self.batch_iterator_test(X_valid, y_valid):
-                valid_outputs.append(
-                    self.apply_batch_func(self.eval_iter_, Xb, yb))
-                batch_valid_sizes.append(len(Xb))
-
-                if self.custom_scores:
-                    y_prob = self.apply_batch_func(self.predict_iter_, Xb)
-                    y_prob = y_prob[0] if len(y_prob) == 1 else y_prob
-                    for custom_scorer, custom_score in zip(
-                            self.custom_scores, custom_scores):
-                        custom_score.append(custom_scorer[1](yb, y_prob))
-
-            train_outputs = np.array(train_outputs, dtype=object).T
-            train_outputs = [
-                np.average(
-                    [np.mean(row) for row in col],
-                    weights=batch_train_sizes,
-                    )
-                for col in train_outputs
-                ]
+        for func in on_training_finished:
+            func(self, self.train_history_)
+
+    def _iter_epochs(self, X_train, y_train, X_valid, y_valid, epochs,
+                     on_batch_finished):
+        """Trains for `epochs` epochs, and yields the number, the
+        duration, the training and validation outputs, the custom
+        scores and the :class:`_Timer` of each one once it's
+        validated.  The validation outputs and custom scores are None
+        for epochs that weren't validated.  With ``async_validation``,
+        the snapshot of the parameters that was validated is yielded,
+        too, else None.
+        """
+        validate_every = getattr(self, 'validate_every', 1)
+        # The validation data to use for all but the last epoch, and
+        # for the last one:
+        valid_sets = [self._subsample_valid(X_valid, y_valid),
+                      (X_valid, y_valid)]
+
+        validator = None
+        if getattr(self, 'async_validation', False):
+            validator = _AsyncValidator(self, valid_sets)
+            params = self.get_all_params()
+        # Validation targets and predictions, reused in every epoch:
+        score_buffers = None
+        # Epochs that wait for their validation by the worker:
+        pending = deque()
+
+        try:
+            for epoch in range(1, epochs + 1):
+                train_outputs = _WeightedMean()
+                timer = _Timer()
+                t0 = time()
+
+                for size, outputs in timer.iterate(
+                        'train_iter',
+                        self._iter_train_batches(X_train, y_train, timer)):
+                    train_outputs.add(outputs, size)
+
+                    for func in on_batch_finished:
+                        with timer(('handlers', _handler_name(func))):
+                            func(self, self.train_history_)
+
+                train_outputs = train_outputs.mean()
+
+                full = epoch == epochs
+                validate = full or epoch % validate_every == 0
+                if validate and validator is None:
+                    valid_outputs, custom_scores, score_buffers = (
+                        self._validate(*valid_sets[full],
+                                       score_buffers=score_buffers,
+                                       timer=timer))
+                    yield (epoch, time() - t0, train_outputs, valid_outputs,
+                           custom_scores, timer, None)
+                    continue
+
+                values = None
+                if validate:
+                    values = _get_flat_values(params)
+                    validator.submit(values, full)
+                pending.append(
+                    (epoch, time() - t0, train_outputs, timer, values))
+                # Leave the latest validation running while the next
+                # epoch trains:
+                while pending and (len(pending) > 1 or
+                                   pending[0][-1] is None):
+                    yield self._receive_validation(
+                        validator, *pending.popleft())
+
+            while pending:
+                yield self._receive_validation(validator, *pending.popleft())
+        finally:
+            if validator is not None:
+                validator.close()
 
-            if valid_outputs:
-                valid_outputs = np.array(valid_outputs, dtype=object).T
-                valid_outputs = [
-                    np.average(
-                        [np.mean(row) for row in col],
-                        weights=batch_valid_sizes,
-                        )
-                    for col in valid_outputs
+    @staticmethod
+    def _receive_validation(validator, epoch, dur, train_outputs, timer,
+                            values):
+        if values is None:
+            return epoch, dur, train_outputs, None, None, timer, None
+        valid_outputs, custom_scores, valid_dur, totals = validator.receive()
+        timer.merge(totals)
+        return (epoch, dur + valid_dur, train_outputs, valid_outputs,
+                custom_scores, timer, values)
+
+    def _subsample_valid(self, X, y):
+        """Returns the fixed random subsample of the validation data
+        that's used with ``valid_subsample``.
+        """
+        subsample = getattr(self, 'valid_subsample', None)
+        if subsample is None or y is None:
+            return X, y
+        if isinstance(subsample, float):
+            subsample = int(round(subsample * len(y)))
+        if subsample >= len(y):
+            return X, y
+        indices = np.sort(np.random.RandomState(42).choice(
+            len(y), subsample, replace=False))
+        return _slview(X, indices), _slview(y, indices)
+
+    def _validate(self, X, y, score_buffers=None, timer=None):
+        """Returns the mean outputs of ``eval_iter_`` on the validation
+        data, the custom scores, and the buffers that were used for
+        ``custom_scores_per_epoch``, to be passed in again next time.
+        """
+        timer = timer or _Timer()
+        custom_scores_per_epoch = getattr(
+            self, 'custom_scores_per_epoch', False)
+        valid_outputs = _WeightedMean()
+        custom_scores = _WeightedMean()
+
+        num_valid_outputs = 2 + len(self.scores_valid)
+        num_valid = 0
+        for size, yb, outputs in timer.iterate(
+                'eval_iter', self._iter_eval_batches(X, y, timer)):
+            valid_outputs.add(outputs[:num_valid_outputs], size)
+
+            if self.custom_scores and custom_scores_per_epoch:
+                score_buffers = _fill_buffers(
+                    score_buffers,
+                    [yb] + list(outputs[num_valid_outputs:]),
+                    num_valid,
+                    len(y),
+                    )
+                num_valid += len(yb)
+            elif self.custom_scores:
+                y_prob = outputs[num_valid_outputs:]
+                y_prob = y_prob[0] if len(y_prob) == 1 else y_prob
+                with timer('custom_scores'):
+                    custom_scores.add(
+                        [custom_scorer[1](yb, y_prob)
+                         for custom_scorer in self.custom_scores],
+                        size)
+
+        if self.custom_scores and custom_scores_per_epoch and num_valid:
+            y_true = score_buffers[0][:num_valid]
+            y_prob = [buf[:num_valid] for buf in score_buffers[1:]]
+            y_prob = y_prob[0] if len(y_prob) == 1 else y_prob
+            with timer('custom_scores'):
+                avg_custom_scores = [
+                    custom_scorer[1](y_true, y_prob)
+                    for custom_scorer in self.custom_scores
                     ]
+        else:
+            avg_custom_scores = custom_scores.mean()
+
+        return valid_outputs.mean(), avg_custom_scores, score_buffers
+
+    def _iter_train_batches(self, X, y, timer=None):
+        """Runs an epoch of training steps, and yields the number of
+        samples and the outputs of each batch.  The time it takes to
+        get the batches is counted for `timer`'s ``batch_train``.
+        """
+        if getattr(self, 'shared_data', False):
+            for size, yb, outputs in self._iter_shared_batches(
+                    'train', self.batch_iterator_train, X, y):
+                yield size, outputs
+            return
 
-            if custom_scores:
-                avg_custom_scores = np.average(
-                    custom_scores, weights=batch_valid_sizes, axis=1)
-
-            if train_outputs[0] < best_train_loss:
-                best_train_loss = train_outputs[0]
-            if valid_outputs and valid_outputs[0] < best_valid_loss:
-                best_valid_loss = valid_outputs[0]
-
-            info = {
-                'epoch': num_epochs_past + epoch,
-                'train_loss': train_outputs[0],
-                'train_loss_best': best_train_loss == train_outputs[0],
-                'valid_loss': valid_outputs[0]
-                if valid_outputs else np.nan,
-                'valid_loss_best': best_valid_loss == valid_outputs[0]
-                if valid_outputs else np.nan,
-                'valid_accuracy': valid_outputs[1]
-                if valid_outputs else np.nan,
-                'dur': time() - t0,
-                }
-
-            if self.custom_scores:
-                for index, custom_score in enumerate(self.custom_scores):
-                    info[custom_score[0]] = avg_custom_scores[index]
-
-            if self.scores_train:
-                for index, (name, func) in enumerate(self.scores_train):
-                    info[name] = train_outputs[index + 1]
-
-            if self.scores_valid:
-                for index, (name, func) in enumerate(self.scores_valid):
-                    info[name] = valid_outputs[index + 2]
-
-            self.train_history_.append(info)
+        timer = timer or _Timer()
+        batches = timer.iterate(
+            'batch_train', self.batch_iterator_train(X, y))
 
+        n_jobs = getattr(self, 'n_jobs', 1)
+        if n_jobs > 1:
+            # Workers are forked for every epoch, so that they start
+            # out with the parameters and handler changes of this one:
+            trainer = _ParallelTrainer(
+                self, n_jobs, getattr(self, 'parallel_sync_every', 1))
             try:
-                for func in on_epoch_finished:
-                    func(self, self.train_history_)
-            except StopIteration:
-                break
+                for Xb, yb in batches:
+                    yield len(Xb), trainer.step(Xb, yb)
+                trainer.sync()
+            finally:
+                trainer.close()
+            return
 
-        for func in on_training_finished:
-            func(self, self.train_history_)
+        accumulation_steps = getattr(self, 'grad_accumulation_steps', 1)
+        if accumulation_steps > 1:
+            train_iter = self._get_iter_func('train_iter_accumulate')
+            apply_grads = self._get_iter_func('apply_grads')
+            num_batches = 0
+            for Xb, yb in batches:
+                outputs = self.apply_batch_func(train_iter, Xb, yb)
+                num_batches += 1
+                if num_batches % accumulation_steps == 0:
+                    apply_grads()
+                yield len(Xb), outputs
+            if num_batches % accumulation_steps:
+                apply_grads()
+            return
+
+        if getattr(self, 'pad_batches', False):
+            train_iter = self._get_iter_func('train_iter_padded')
+            batch_size = self.batch_iterator_train.batch_size
+            for Xb, yb in batches:
+                yield _num_samples(Xb), self._apply_padded(
+                    train_iter, batch_size, Xb, yb)
+            return
+
+        train_steps = getattr(self, 'train_steps_per_call', 1)
+        for group in _group_batches(batches, train_steps):
+            if train_steps > 1:
+                # Always use the same function, since each one has its
+                # own state of the update rule, e.g. momentum:
+                outputs = self.apply_batch_func(
+                    self._get_iter_func('train_iter_steps'),
+                    *_stack_batches(group))
+                outputs = zip(*outputs)
+            else:
+                outputs = [self.apply_batch_func(self.train_iter_, *group[0])]
+
+            for (Xb, yb), batch_outputs in zip(group, outputs):
+                yield len(Xb), batch_outputs
+
+    def _iter_eval_batches(self, X, y, timer=None):
+        """Yields the number of samples, the targets and the outputs of
+        ``eval_iter_`` of each validation batch.  The time it takes to
+        get the batches is counted for `timer`'s ``batch_valid``.
+        """
+        if getattr(self, 'shared_data', False):
+            for batch in self._iter_shared_batches(
+                    'valid', self.batch_iterator_test, X, y):
+                yield batch
+            return
+
+        timer = timer or _Timer()
+        batches = timer.iterate('batch_valid', self.batch_iterator_test(X, y))
+        if getattr(self, 'pad_batches', False):
+            eval_iter = self._get_iter_func('eval_iter_padded')
+            batch_size = self.batch_iterator_test.batch_size
+            num_valid_outputs = 2 + len(self.scores_valid)
+            for Xb, yb in batches:
+                num_samples = _num_samples(Xb)
+                outputs = self._apply_padded(eval_iter, batch_size, Xb, yb)
+                # The predictions for the custom scores are padded:
+                outputs = outputs[:num_valid_outputs] + [
+                    output[:num_samples]
+                    for output in outputs[num_valid_outputs:]]
+                yield num_samples, yb, outputs
+            return
+
+        for Xb, yb in batches:
+            yield len(Xb), yb, self.apply_batch_func(self.eval_iter_, Xb, yb)
+
+    def _apply_padded(self, func, batch_size, Xb, yb):
+        # Calls one of the functions that take padded batches, along
+        # with the number of samples that aren't padding:
+        num_samples = _num_samples(Xb)
+        Xb, yb = _pad_rows(Xb, batch_size), _pad_rows(yb, batch_size)
+        if isinstance(Xb, dict):
+            return func(num_samples=num_samples, y=yb, **Xb)
+        return func(Xb, yb, num_samples)
+
+    def _get_iter_func(self, name):
+        # Functions other than the ones set up by initialize() are
+        # created on first use, and compiled lazily, too:
+        func = getattr(self, name + '_', None)
+        if func is None:
+            func = _LazyIterFunc(self, name)
+            setattr(self, name + '_', func)
+        return func
+
+    def _check_train_options(self):
+        if getattr(self, 'validate_every', 1) < 1:
+            raise ValueError("'validate_every' must be at least 1.")
+        valid_subsample = getattr(self, 'valid_subsample', None)
+        if isinstance(valid_subsample, float) and not (
+                0 < valid_subsample <= 1):
+            raise ValueError(
+                "A float 'valid_subsample' must be between 0 and 1.")
+
+        options = []
+        if getattr(self, 'train_steps_per_call', 1) > 1:
+            options.append('train_steps_per_call')
+        if getattr(self, 'shared_data', False):
+            options.append('shared_data')
+        if getattr(self, 'grad_accumulation_steps', 1) > 1:
+            options.append('grad_accumulation_steps')
+        if getattr(self, 'n_jobs', 1) > 1:
+            options.append('n_jobs')
+        if getattr(self, 'pad_batches', False):
+            options.append('pad_batches')
+        if len(options) > 1:
+            raise ValueError(
+                "The {} options can't be used together.".format(
+                    " and ".join("'{}'".format(name) for name in options)))
+
+        if not getattr(self, 'shared_data', False):
+            return
+        for batch_iterator in (
+                self.batch_iterator_train, self.batch_iterator_test):
+            if type(batch_iterator).transform is not BatchIterator.transform:
+                raise ValueError(
+                    "With 'shared_data', batches are never seen by the "
+                    "batch iterator, so its 'transform' method can't be "
+                    "overridden.")
+
+    def _get_shared_storage(self, name):
+        # Returns a dict of shared variables, one for each input and
+        # for the targets 'y', to hold the training or validation data:
+        attr = 'shared_{}_'.format(name)
+        storage = getattr(self, attr, None)
+        if storage is None:
+            storage = OrderedDict()
+            for input in self._get_iter_inputs(self.y_tensor_type('y')):
+                var = input.variable
+                storage[input.name] = theano.shared(
+                    np.zeros((0,) * var.ndim, dtype=var.dtype),
+                    broadcastable=var.broadcastable,
+                    name='{}_{}'.format(name, input.name),
+                    )
+            setattr(self, attr, storage)
+        return storage
+
+    def _load_shared(self, name, X, y, sl):
+        storage = self._get_shared_storage(name)
+        loaded = getattr(self, '_shared_loaded', {})
+        # Compare the arrays by identity, and keep references to them,
+        # so that their ids can't be reused by other arrays meanwhile:
+        X_loaded, y_loaded, sl_loaded = loaded.get(name, (None, None, None))
+        if (X_loaded is X and y_loaded is y and
+                sl_loaded == (sl.start, sl.stop)):
+            return
+        if isinstance(X, dict):
+            inputs = dict(X, y=y)
+        else:
+            input_names = [k for k in storage if k != 'y']
+            inputs = {input_names[0]: X, 'y': y}
+        for input_name, var in storage.items():
+            var.set_value(np.asarray(inputs[input_name][sl], dtype=var.dtype))
+        loaded[name] = (X, y, (sl.start, sl.stop))
+        self._shared_loaded = loaded
+
+    def _iter_shared_batches(self, name, batch_iterator, X, y):
+        """Loads `X` and `y` into shared variables, in chunks of
+        ``shared_data_chunk_size`` samples, and runs the ``train`` or
+        ``valid`` function on batches of indexes into the chunk.
+        """
+        if y is None or not len(y):
+            return
+        func = self._get_iter_func(
+            'train_iter_shared' if name == 'train' else 'eval_iter_shared')
+
+        num_samples = len(y)
+        chunk_size = (getattr(self, 'shared_data_chunk_size', None) or
+                      num_samples)
+        batch_size = batch_iterator.batch_size
+        for start in range(0, num_samples, chunk_size):
+            sl = slice(start, min(start + chunk_size, num_samples))
+            self._load_shared(name, X, y, sl)
+            y_chunk = y[sl]
+            if batch_iterator.shuffle:
+                indices = batch_iterator.random.permutation(len(y_chunk))
+            else:
+                indices = np.arange(len(y_chunk))
+            for i in range(0, len(indices), batch_size):
+                index = indices[i:i + batch_size]
+                yield len(index), y_chunk[index], func(index)
+
+    def _get_shared_givens(self, name, y_batch):
+        index = T.lvector('index')
+        storage = self._get_shared_storage(name)
+        givens = OrderedDict(
+            (input.variable, storage[input.name][index])
+            for input in self._get_iter_inputs(y_batch)
+            )
+        return index, givens
+
+    def _create_train_iter_shared(self):
+        y_batch = self.y_tensor_type('y_batch')
+        outputs, updates = self._get_train_outputs(y_batch)
+        index, givens = self._get_shared_givens('train', y_batch)
+        return self._compile_function(
+            'train_iter_shared',
+            inputs=[index],
+            outputs=outputs,
+            updates=updates,
+            givens=givens,
+            )
+
+    def _create_eval_iter_shared(self):
+        y_batch = self.y_tensor_type('y_batch')
+        outputs = self._get_eval_outputs(y_batch)
+        index, givens = self._get_shared_givens('valid', y_batch)
+        return self._compile_function(
+            'eval_iter_shared',
+            inputs=[index],
+            outputs=outputs,
+            givens=givens,
+            )
 
     @staticmethod
     def apply_batch_func(func, Xb, yb=None):
@@ -827,12 +2417,118 @@ class NeuralNet(BaseEstimator):
         else:
             return func(Xb) if yb is None else func(Xb, yb)
 
-    def predict_proba(self, X):
-        probas = []
-        for Xb, yb in self.batch_iterator_test(X):
-            probas.append(self.apply_batch_func(self.predict_iter_, Xb))
-        output = tuple(np.vstack(o) for o in zip(*probas))
-        return output if len(output) > 1 else output[0]
+    def iter_predict_proba(self, X):
+        """Yields the output of the network for each batch of `X`, or
+        a tuple of outputs for networks with more than one output
+        layer.  Use this to process predictions for more data than
+        fits into memory.
+        """
+        return self._iter_predict_proba(X, self.batch_iterator_test)
+
+    def _iter_predict_proba(self, X, batch_iterator):
+        pad = getattr(self, 'pad_batches', False)
+        for Xb, yb in batch_iterator(X):
+            num_samples = _num_samples(Xb)
+            if pad:
+                Xb = _pad_rows(Xb, batch_iterator.batch_size)
+            output = self.apply_batch_func(self.predict_iter_, Xb)
+            if pad:
+                output = [out[:num_samples] for out in output]
+            yield tuple(output) if len(output) > 1 else output[0]
+
+    def predict_proba(self, X, out=None):
+        """Returns the output of the network for `X`, or a tuple of
+        outputs for networks with more than one output layer.  With
+        ``predict_n_jobs``, the batches are split among as many
+        processes.
+
+        :param out: An array to write the output into, e.g. a
+                    :class:`numpy.memmap`, or a tuple of arrays for
+                    networks with more than one output layer.  By
+                    default, arrays are allocated when the first batch
+                    is done.
+        """
+        n_jobs = getattr(self, 'predict_n_jobs', 1)
+        if n_jobs > 1:
+            return self._predict_proba_parallel(X, out, n_jobs)
+        return self._predict_proba(X, out)
+
+    def _predict_proba(self, X, out=None):
+        return _collect_outputs(self.iter_predict_proba(X), out, X)
+
+    def _predict_proba_parallel(self, X, out, n_jobs):
+        # Each process predicts a contiguous range of whole batches,
+        # so that the batches are the same as with a single process:
+        num_samples = _num_samples(X)
+        batch_size = getattr(self.batch_iterator_test, 'batch_size', 1) or 1
+        num_batches = -(-num_samples // batch_size)
+        step = max(1, -(-num_batches // n_jobs)) * batch_size
+        ranges = [(start, min(start + step, num_samples))
+                  for start in range(0, num_samples, step)]
+        if len(ranges) < 2:
+            return self._predict_proba(X, out)
+
+        predict_iter = self.predict_iter_
+        if isinstance(predict_iter, _LazyIterFunc):
+            predict_iter.compile()
+
+        # Predict a single sample to find out the outputs' shapes:
+        sample = next(self.iter_predict_proba(_sldict(X, slice(0, 1))))
+        sample = list(sample) if isinstance(sample, tuple) else [sample]
+        if out is None:
+            out = [None] * len(sample)
+        elif not isinstance(out, (list, tuple)):
+            out = [out]
+        buffers = [
+            _shared_buffer(target, (num_samples,) + arr.shape[1:], arr.dtype)
+            for target, arr in zip(out, sample)
+            ]
+
+        context = _fork_context()
+
+        workers = []
+        for start, stop in ranges[1:]:
+            conn, worker_conn = context.Pipe()
+            # Not daemons, so that they can have children of their
+            # own, e.g. the workers of the batch iterator:
+            process = context.Process(
+                target=self._predict_proba_worker,
+                args=(worker_conn, X, buffers, start, stop))
+            process.start()
+            workers.append((conn, process))
+
+        try:
+            self._predict_proba_worker(None, X, buffers, *ranges[0])
+            for conn, process in workers:
+                try:
+                    error = conn.recv()
+                except EOFError:
+                    error = "The worker process exited unexpectedly."
+                if error is not None:
+                    raise RuntimeError(
+                        "Prediction in a worker process failed:\n" + error)
+        finally:
+            for conn, process in workers:
+                process.join()
+
+        output = []
+        for target, buf in zip(out, buffers):
+            if target is not None and target is not buf:
+                target[:num_samples] = buf
+                buf = target
+            output.append(buf[:num_samples])
+        return tuple(output) if len(output) > 1 else output[0]
+
+    def _predict_proba_worker(self, conn, X, buffers, start, stop):
+        # Runs in the main process, too, which passes no `conn`:
+        out = tuple(buf[start:stop] for buf in buffers)
+        if conn is None:
+            return self._predict_proba(_sldict(X, slice(start, stop)), out)
+        try:
+            self._predict_proba(_sldict(X, slice(start, stop)), out)
+            conn.send(None)
+        except Exception:
+            conn.send(traceback.format_exc())
 
     def predict(self, X):
         if self.regression:
@@ -843,26 +2539,47 @@ class NeuralNet(BaseEstimator):
                 y_pred = self.enc_.inverse_transform(y_pred)
             return y_pred
 
-    def get_output(self, layer, X):
-        if isinstance(layer, basestring):
-            layer = self.layers_[layer]
+    def get_output(self, layer, X, out=None):
+        """Returns the output of `layer` for `X`.  `layer` is a layer
+        or the name of one.  For a list of layers, all their outputs
+        are computed in a single pass through the network, and a tuple
+        with one array per layer is returned.
+
+        :param out: An array to write the output into, or a tuple of
+                    arrays for a list of layers; see
+                    :meth:`predict_proba`.
+        """
+        return _collect_outputs(self.iter_get_output(layer, X), out, X)
+
+    def iter_get_output(self, layer, X):
+        """Yields the output of `layer` for each batch of `X`, or a
+        tuple of outputs for a list of layers.  See :meth:`get_output`.
+        """
+        many = isinstance(layer, (list, tuple))
+        layers = [self.layers_[l] if isinstance(l, basestring) else l
+                  for l in (layer if many else [layer])]
+        key = tuple(layers) if many else layers[0]
 
         fn_cache = getattr(self, '_get_output_fn_cache', None)
         if fn_cache is None:
             fn_cache = {}
             self._get_output_fn_cache = fn_cache
 
-        if layer not in fn_cache:
+        if key not in fn_cache:
             xs = self.layers_[0].input_var.type()
-            get_activity = theano.function([xs], get_output(layer, xs))
-            fn_cache[layer] = get_activity
+            get_activity = self._compile_function(
+                'get_output', [xs], get_output(layers, xs))
+            fn_cache[key] = get_activity
         else:
-            get_activity = fn_cache[layer]
+            get_activity = fn_cache[key]
 
-        outputs = []
+        pad = getattr(self, 'pad_batches', False)
         for Xb, yb in self.batch_iterator_test(X):
-            outputs.append(get_activity(Xb))
-        return np.vstack(outputs)
+            num_samples = len(Xb)
+            if pad:
+                Xb = _pad_rows(Xb, self.batch_iterator_test.batch_size)
+            outputs = [output[:num_samples] for output in get_activity(Xb)]
+            yield tuple(outputs) if many else outputs[0]
 
     def score(self, X, y):
         score = r2_score if self.regression else accuracy_score
@@ -914,6 +2631,39 @@ class NeuralNet(BaseEstimator):
                             print(failure.format(
                                 key, shape1s, shape2s))
 
+    @classmethod
+    def load_for_inference(cls, source):
+        """Loads a pickled network for making predictions.
+
+        The compiled Theano functions stored in the pickle are not
+        rebuilt.  Only the prediction function is compiled, and only
+        when it's first used.  The net can still be trained afterwards,
+        but any state held by the update rule, like momentum, is lost.
+
+        :param source: A file name or an open file of a net that was
+                       pickled with :func:`pickle.dump`.
+        """
+        unpickle_function = theano.config.unpickle_function
+        theano.config.unpickle_function = False
+        try:
+            if isinstance(source, basestring):
+                with open(source, 'rb') as f:
+                    net = pickle.load(f)
+            else:
+                net = pickle.load(source)
+        finally:
+            theano.config.unpickle_function = unpickle_function
+
+        if not isinstance(net, cls):
+            raise ValueError("Expected a pickled {}, got {}.".format(
+                cls.__name__, type(net).__name__))
+
+        net._get_output_fn_cache = {}
+        net.train_iter_, net.eval_iter_, net.predict_iter_ = (
+            net._create_iter_funcs(
+                net.layers_, net.objective, net.update, net.y_tensor_type))
+        return net
+
     def save_params_to(self, fname):
         params = self.get_all_params_values()
         with open(fname, 'wb') as f:
@@ -0,0 +1,146 @@
+from lasagne import nonlinearities
+from lasagne.layers import Conv2DLayer
+from lasagne.layers import DenseLayer
+from lasagne.layers import DropoutLayer
+from lasagne.layers import InputLayer
+from lasagne.layers import NonlinearityLayer
+from lasagne.layers import Pool2DLayer
+import numpy as np
+
+from .. import numpy_net
+
+
+def _export_nonlinearity(nonlinearity):
+    if nonlinearity is None:
+        return numpy_net.Nonlinearity('identity')
+    if isinstance(nonlinearity, nonlinearities.LeakyRectify):
+        return numpy_net.Nonlinearity(
+            'leaky_rectify', leakiness=nonlinearity.leakiness)
+    for name in numpy_net.NONLINEARITIES:
+        if nonlinearity is getattr(nonlinearities, name, None):
+            return numpy_net.Nonlinearity(name)
+    if nonlinearity is nonlinearities.linear:
+        return numpy_net.Nonlinearity('identity')
+    raise ValueError("Can't export nonlinearity {}.".format(nonlinearity))
+
+
+def _export_dense(layer):
+    if getattr(layer, 'num_leading_axes', 1) != 1:
+        raise ValueError("Can't export DenseLayer with num_leading_axes "
+                         "other than 1.")
+    return numpy_net.Dense(
+        W=layer.W.get_value(),
+        b=layer.b.get_value() if layer.b is not None else None,
+        nonlinearity=_export_nonlinearity(layer.nonlinearity),
+        )
+
+
+def _export_conv2d(layer):
+    W = layer.W.get_value()
+    if getattr(layer, 'flip_filters', True):
+        # Lasagne computes a true convolution; the NumPy version
+        # computes a correlation, so we flip the filters once here:
+        W = W[:, :, ::-1, ::-1]
+    W = np.ascontiguousarray(W)
+    filter_size = W.shape[2:]
+
+    crop = None
+    if layer.pad == 'full':
+        pad = tuple(s - 1 for s in filter_size)
+    elif layer.pad == 'same':
+        pad = tuple(s // 2 for s in filter_size)
+        crop = layer.output_shape[2:]
+    else:
+        pad = tuple(layer.pad)
+
+    return numpy_net.Conv2D(
+        W=W,
+        b=layer.b.get_value() if layer.b is not None else None,
+        stride=layer.stride,
+        pad=pad,
+        nonlinearity=_export_nonlinearity(layer.nonlinearity),
+        crop=crop,
+        )
+
+
+def _export_pool2d(layer):
+    if getattr(layer, 'mode', 'max') != 'max':
+        raise ValueError("Can't export pooling mode {}.".format(layer.mode))
+    return numpy_net.MaxPool2D(
+        pool_size=layer.pool_size,
+        stride=layer.stride,
+        pad=layer.pad,
+        ignore_border=layer.ignore_border,
+        )
+
+
+def _export_nonlinearity_layer(layer):
+    return _export_nonlinearity(layer.nonlinearity)
+
+
+EXPORTERS = [
+    (DenseLayer, _export_dense),
+    (Conv2DLayer, _export_conv2d),
+    (Pool2DLayer, _export_pool2d),
+    (NonlinearityLayer, _export_nonlinearity_layer),
+    ]
+
+
+def export_numpy(net, batch_size=None):
+    """Returns a :class:`nolearn.numpy_net.NumpyNet` that computes the
+    same predictions as the trained `net`, but doesn't need Theano.
+
+    Supported are networks that form a chain of
+    :class:`InputLayer`, :class:`DenseLayer`, :class:`Conv2DLayer`,
+    :class:`MaxPool2DLayer` (or :class:`Pool2DLayer` with mode
+    ``'max'``), :class:`DropoutLayer` and
+    :class:`NonlinearityLayer` layers.  Dropout is left out, as it's
+    inactive when making predictions.
+
+    :param net: An initialized :class:`NeuralNet` with a single input
+                and output layer.
+    :param batch_size: The batch size of the returned net.  Defaults to
+                       the batch size of `net.batch_iterator_test`.
+    """
+    net.initialize()
+    if len(net._output_layers) != 1:
+        raise ValueError("Can't export a net with more than one output.")
+
+    chain = []
+    layer = net._output_layers[0]
+    while not isinstance(layer, InputLayer):
+        if not hasattr(layer, 'input_layer'):
+            raise ValueError(
+                "Can't export layer '{}' with more than one input.".format(
+                    type(layer).__name__))
+        chain.append(layer)
+        layer = layer.input_layer
+    chain.reverse()
+    input_layer = layer
+
+    names = {layer: name for name, layer in net.layers_.items()}
+    layers = []
+    for layer in chain:
+        if isinstance(layer, DropoutLayer):
+            continue
+        for layer_type, exporter in EXPORTERS:
+            if isinstance(layer, layer_type):
+                layers.append((names.get(layer), exporter(layer)))
+                break
+        else:
+            raise ValueError("Can't export layer '{}' of type {}.".format(
+                names.get(layer), type(layer).__name__))
+
+    if batch_size is None:
+        batch_size = net.batch_iterator_test.batch_size
+    classes = getattr(net, 'classes_', None)
+    if not getattr(net, 'use_label_encoder', False):
+        classes = None
+
+    return numpy_net.NumpyNet(
+        layers,
+        batch_size=batch_size,
+        regression=net.regression,
+        classes=classes,
+        dtype=np.dtype(input_layer.input_var.dtype),
+        )
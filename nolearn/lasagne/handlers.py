@@ -24,6 +24,11 @@ class PrintLog:
 
     def table(self, nn, train_history):
         info = train_history[-1]
+        # Epochs that weren't validated show empty validation columns:
+        fresh = info.get('valid_fresh', True)
+
+        def valid(value):
+            return value if fresh else ""
 
         info_tabulate = OrderedDict([
             ('epoch', info['epoch']),
@@ -32,29 +37,38 @@ class PrintLog:
                 info['train_loss'],
                 ansi.ENDC if info['train_loss_best'] else "",
                 )),
-            ('val loss', "{}{:.5f}{}".format(
+            ('val loss', valid("{}{:.5f}{}".format(
                 ansi.GREEN if info['valid_loss_best'] else "",
                 info['valid_loss'],
                 ansi.ENDC if info['valid_loss_best'] else "",
-                )),
-            ('trn/val', info['train_loss'] / info['valid_loss']),
+                ))),
+            ('trn/val', valid(info['train_loss'] / info['valid_loss'])),
             ])
 
         if not nn.regression:
-            info_tabulate['valid acc'] = info['valid_accuracy']
+            info_tabulate['valid acc'] = valid(info['valid_accuracy'])
 
         for name, func in nn.scores_train:
             info_tabulate[name] = info[name]
 
         for name, func in nn.scores_valid:
-            info_tabulate[name] = info[name]
+            info_tabulate[name] = valid(info[name])
 
         if nn.custom_scores:
             for custom_score in nn.custom_scores:
-                info_tabulate[custom_score[0]] = info[custom_score[0]]
+                info_tabulate[custom_score[0]] = valid(info[custom_score[0]])
 
         info_tabulate['dur'] = "{:.2f}s".format(info['dur'])
 
+        if 'timing' in info and nn.verbose > 2:
+            from .base import _Timer  # base imports this module
+            timing = info['timing']
+            for name in _Timer.phases:
+                if name in timing:
+                    info_tabulate[name] = "{:.2f}s".format(timing[name])
+            info_tabulate['handlers'] = "{:.2f}s".format(
+                sum(timing['handlers'].values()))
+
         tabulated = tabulate(
             [info_tabulate], headers="keys", floatfmt='.5f')
 
@@ -79,8 +93,12 @@ class SaveWeights:
 
     def __call__(self, nn, train_history):
         if self.only_best:
+            # Epochs that weren't validated are never the best:
+            if not train_history[-1].get('valid_fresh', True):
+                return
             this_loss = train_history[-1]['valid_loss']
-            best_loss = min([h['valid_loss'] for h in train_history])
+            best_loss = min([h['valid_loss'] for h in train_history
+                             if h.get('valid_fresh', True)])
             if this_loss > best_loss:
                 return
 
@@ -142,6 +160,46 @@ class RememberBestWeights:
             self.best_weights_epoch = train_history[-1]['epoch']
 
 
+class PrintProfile:
+    """Prints Theano's profiles of the net's compiled functions, e.g.
+    which ops took the most time.  Requires a net with
+    ``profile=True``.  Pass instances of :class:`PrintProfile` as an
+    `on_training_finished` handler.
+    """
+    def __init__(self, n_ops_to_print=20, n_apply_to_print=20, file=None):
+        self.n_ops_to_print = n_ops_to_print
+        self.n_apply_to_print = n_apply_to_print
+        self.file = file
+
+    def __call__(self, nn, train_history=None):
+        file = self.file or sys.stdout
+        profiles = self.get_profiles(nn)
+        if not profiles:
+            file.write("No profiles to print; use 'profile=True' to "
+                       "record them.\n")
+        for name, profile in profiles:
+            profile.summary(
+                file=file,
+                n_ops_to_print=self.n_ops_to_print,
+                n_apply_to_print=self.n_apply_to_print,
+                )
+        file.flush()
+
+    @staticmethod
+    def get_profiles(nn):
+        """Returns a list of ``(name, profile)`` tuples of the net's
+        compiled functions that were profiled and called.
+        """
+        profiles = []
+        for name, func in sorted(vars(nn).items()):
+            # Functions that are compiled lazily are wrapped:
+            func = getattr(func, 'func', func)
+            profile = getattr(func, 'profile', None)
+            if name.endswith('_') and getattr(profile, 'fct_callcount', 0):
+                profiles.append((name, profile))
+        return profiles
+
+
 class PrintLayerInfo:
     def __init__(self):
         pass
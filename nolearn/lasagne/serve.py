@@ -0,0 +1,309 @@
+"""Serves the predictions of a trained :class:`NeuralNet` to many
+clients that each send a few rows at a time.
+
+A :class:`MicroBatcher` collects concurrent requests into batches,
+and runs the net's prediction function once per batch.  Use it in
+the same process, or behind a :class:`UnixServer` that
+:class:`UnixClient` instances connect to.
+"""
+
+from collections import deque
+import copy
+from io import BytesIO
+import socket
+import struct
+import threading
+from time import time
+
+import numpy as np
+
+from .._compat import queue
+from .._compat import socketserver
+from .base import _collect_outputs
+from .base import _LazyIterFunc
+
+
+def _num_rows(X):
+    return len(list(X.values())[0]) if isinstance(X, dict) else len(X)
+
+
+def _concatenate(Xs):
+    if len(Xs) == 1:
+        return Xs[0]
+    if isinstance(Xs[0], dict):
+        return {key: np.concatenate([X[key] for X in Xs]) for key in Xs[0]}
+    return np.concatenate(Xs)
+
+
+class _Request(object):
+    def __init__(self, X):
+        self.X = X
+        self.num_rows = _num_rows(X)
+        self.submitted = time()
+        self.done = threading.Event()
+        self.output = None
+        self.error = None
+
+    def result(self, timeout=None):
+        """Waits for the output of the net for this request, and
+        returns it.  Raises the error of the net if it failed.
+        """
+        if not self.done.wait(timeout):
+            raise RuntimeError("The request timed out.")
+        if self.error is not None:
+            raise self.error
+        return self.output
+
+
+class MicroBatcher(object):
+    """Collects concurrent requests for predictions into batches.
+
+    A thread takes the requests off a queue.  Starting with the
+    oldest one, it waits for more until their rows fill a batch of
+    `max_batch_size`, or until `max_latency` seconds have passed since
+    the oldest one was submitted.  It then predicts the whole batch
+    at once, and hands each request its rows of the output.
+
+    Use as a context manager, or call :meth:`start` and :meth:`stop`.
+    The batcher predicts with its own copy of the net's
+    ``batch_iterator_test``, but otherwise shares the net with its
+    thread: don't train or otherwise use the net while the batcher
+    runs.
+    """
+    def __init__(self, net, max_batch_size=None, max_latency=0.005,
+                 history=1000):
+        """
+        :param net: An initialized :class:`NeuralNet`.
+        :param max_batch_size: The most rows to predict at once.
+                               Defaults to the batch size of
+                               `net.batch_iterator_test`.
+        :param max_latency: The longest time in seconds to wait for
+                            more requests.
+        :param history: The number of requests and batches to keep
+                        for the :meth:`stats`.
+        """
+        self.net = net
+        self.batch_iterator = copy.copy(net.batch_iterator_test)
+        self.max_batch_size = max_batch_size or self.batch_iterator.batch_size
+        self.max_latency = max_latency
+        self.queue = queue.Queue()
+        self.latencies = deque(maxlen=history)
+        self.batch_sizes = deque(maxlen=history)
+        self.num_requests = 0
+        self.num_batches = 0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        predict_iter = self.net.predict_iter_
+        if isinstance(predict_iter, _LazyIterFunc):
+            predict_iter.compile()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Predicts all requests that were submitted already, and
+        stops the thread.
+        """
+        self.queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def submit(self, X):
+        """Submits a request to predict the rows of `X`, and returns
+        it.  Call the request's ``result()`` method to wait for the
+        output.
+        """
+        request = _Request(X)
+        self.queue.put(request)
+        return request
+
+    def predict_proba(self, X, timeout=None):
+        """Returns the output of the net for the rows of `X`, like
+        :meth:`NeuralNet.predict_proba`, but predicted along with the
+        rows of other requests.
+        """
+        return self.submit(X).result(timeout)
+
+    def stats(self):
+        """Returns a dict with the number of requests and batches
+        served, the current and largest number of requests in the
+        queue, the mean batch size, and the median, 99th percentile
+        and maximum latency in seconds of the last `history` requests.
+        """
+        with self._lock:
+            latencies = np.array(self.latencies)
+            batch_sizes = np.array(self.batch_sizes)
+            stats = {
+                'num_requests': self.num_requests,
+                'num_batches': self.num_batches,
+                'queue_depth': self.queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                }
+        stats['batch_size_mean'] = (
+            batch_sizes.mean() if len(batch_sizes) else np.nan)
+        for name, q in (('p50', 50), ('p99', 99), ('max', 100)):
+            stats['latency_' + name] = (
+                np.percentile(latencies, q) if len(latencies) else np.nan)
+        return stats
+
+    def _run(self):
+        # A request that didn't fit into the last batch:
+        request = None
+        stopped = False
+        while not stopped:
+            if request is None:
+                request = self.queue.get()
+            if request is None:
+                break
+
+            batch = [request]
+            num_rows = request.num_rows
+            deadline = request.submitted + self.max_latency
+            request = None
+            while num_rows < self.max_batch_size:
+                try:
+                    request = self.queue.get(
+                        timeout=max(deadline - time(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopped = True
+                    break
+                if num_rows + request.num_rows > self.max_batch_size:
+                    break
+                batch.append(request)
+                num_rows += request.num_rows
+                request = None
+
+            self._predict(batch)
+
+    def _predict(self, batch):
+        with self._lock:
+            self.max_queue_depth = max(
+                self.max_queue_depth, self.queue.qsize() + len(batch))
+
+        try:
+            X = _concatenate([request.X for request in batch])
+            output = _collect_outputs(
+                self.net._iter_predict_proba(X, self.batch_iterator), None, X)
+        except Exception as e:
+            if len(batch) > 1:
+                # Only fail the requests that fail on their own:
+                for request in batch:
+                    self._predict([request])
+                return
+            batch[0].error = e
+            batch[0].done.set()
+            return
+
+        outputs = output if isinstance(output, tuple) else (output,)
+        now = time()
+        offset = 0
+        with self._lock:
+            for request in batch:
+                stop = offset + request.num_rows
+                output = tuple(out[offset:stop] for out in outputs)
+                request.output = output if len(output) > 1 else output[0]
+                offset = stop
+                self.latencies.append(now - request.submitted)
+                request.done.set()
+            self.batch_sizes.append(offset)
+            self.num_requests += len(batch)
+            self.num_batches += 1
+
+
+def _write_arrays(wfile, arrays):
+    wfile.write(struct.pack('!I', len(arrays)))
+    for array in arrays:
+        buf = BytesIO()
+        np.lib.format.write_array(buf, np.asarray(array), allow_pickle=False)
+        data = buf.getvalue()
+        wfile.write(struct.pack('!Q', len(data)))
+        wfile.write(data)
+    wfile.flush()
+
+
+def _read_exactly(rfile, size):
+    data = rfile.read(size)
+    if len(data) != size:
+        raise EOFError()
+    return data
+
+
+def _read_arrays(rfile):
+    count, = struct.unpack('!I', _read_exactly(rfile, 4))
+    arrays = []
+    for i in range(count):
+        size, = struct.unpack('!Q', _read_exactly(rfile, 8))
+        arrays.append(np.lib.format.read_array(
+            BytesIO(_read_exactly(rfile, size)), allow_pickle=False))
+    return arrays
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                X, = _read_arrays(self.rfile)
+            except EOFError:
+                break
+            try:
+                output = self.server.batcher.predict_proba(X)
+            except Exception as e:
+                self.wfile.write(b'E')
+                _write_arrays(self.wfile, [np.array(
+                    "{}: {}".format(type(e).__name__, e))])
+                continue
+            self.wfile.write(b'O')
+            _write_arrays(
+                self.wfile, output if isinstance(output, tuple) else [output])
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves the predictions of a :class:`MicroBatcher` over a Unix
+    socket at `path`, with one thread per connection.  Call
+    ``serve_forever()`` to run it, and ``shutdown()`` to stop it.
+
+    Arrays are sent in NumPy's ``.npy`` format, without pickles, so
+    dtypes of object aren't supported.
+    """
+    daemon_threads = True
+
+    def __init__(self, batcher, path):
+        self.batcher = batcher
+        socketserver.UnixStreamServer.__init__(self, path, _RequestHandler)
+
+
+class UnixClient(object):
+    """Connects to a :class:`UnixServer` at `path`."""
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.rfile = self.sock.makefile('rb')
+        self.wfile = self.sock.makefile('wb')
+
+    def predict_proba(self, X):
+        """Returns the output of the served net for the rows of `X`.
+        Raises :class:`RuntimeError` if the prediction failed.
+        """
+        _write_arrays(self.wfile, [X])
+        status = _read_exactly(self.rfile, 1)
+        arrays = _read_arrays(self.rfile)
+        if status == b'E':
+            raise RuntimeError(str(arrays[0]))
+        return tuple(arrays) if len(arrays) > 1 else arrays[0]
+
+    def close(self):
+        self.rfile.close()
+        self.wfile.close()
+        self.sock.close()
@@ -2,6 +2,7 @@ import numpy as np
 import pytest
 from sklearn.datasets import load_boston
 from sklearn.datasets import fetch_mldata
+from sklearn.datasets import make_classification
 from sklearn.preprocessing import StandardScaler
 from sklearn.utils import shuffle
 
@@ -12,6 +13,7 @@ from lasagne.layers import MaxPool2DLayer
 from lasagne.layers import NonlinearityLayer
 from lasagne.nonlinearities import softmax
 from lasagne.updates import nesterov_momentum
+import theano
 
 
 @pytest.fixture(scope='session')
@@ -25,6 +27,43 @@ def nn(NeuralNet):
     return NeuralNet([('input', object())], input_shape=(10, 10))
 
 
+@pytest.fixture(scope='session')
+def make_net(NeuralNet):
+    """Returns a function that makes a small classifier for the
+    data of :func:`make_data`, with an optional hidden layer of
+    `num_hidden` units, and batches of `batch_size` samples.
+    """
+    from nolearn.lasagne import BatchIterator
+    from nolearn.lasagne import TrainSplit
+
+    def make_net(num_hidden=8, num_classes=2, batch_size=16, **kwargs):
+        l = InputLayer(shape=(None, 20))
+        if num_hidden:
+            l = DenseLayer(l, num_units=num_hidden)
+        l = DenseLayer(l, num_units=num_classes, nonlinearity=softmax)
+        kwargs.setdefault('update_learning_rate', 0.01)
+        kwargs.setdefault('max_epochs', 2)
+        kwargs.setdefault('batch_iterator_train', BatchIterator(batch_size))
+        kwargs.setdefault('batch_iterator_test', BatchIterator(batch_size))
+        kwargs.setdefault('train_split', TrainSplit(eval_size=0.2))
+        return NeuralNet(l, **kwargs)
+    return make_net
+
+
+@pytest.fixture(scope='session')
+def make_data():
+    def make_data(n_samples=200, **kwargs):
+        X, y = make_classification(
+            n_samples=n_samples, n_features=20, **kwargs)
+        return X.astype(theano.config.floatX), y.astype(np.int32)
+    return make_data
+
+
+@pytest.fixture
+def data(make_data):
+    return make_data()
+
+
 @pytest.fixture(scope='session')
 def mnist():
     dataset = fetch_mldata('mnist-original')
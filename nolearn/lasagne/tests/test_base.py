@@ -23,6 +23,7 @@ from sklearn.datasets import make_classification
 from sklearn.datasets import make_regression
 from sklearn.grid_search import GridSearchCV
 from sklearn.metrics import accuracy_score
+from sklearn.metrics import f1_score
 from sklearn.metrics import mean_absolute_error
 from sklearn.metrics import r2_score
 import theano
@@ -96,6 +97,107 @@ class TestFunctionalToy:
         y = y.astype(np.int32)
         self.classif_no_valid(NeuralNet, X, y)
 
+    def test_classif_memmap(self, NeuralNet, tmpdir):
+        X, y = make_classification()
+        X_mm = np.memmap(
+            str(tmpdir.join('X.mm')), dtype=floatX, mode='w+',
+            shape=X.shape)
+        X_mm[:] = X
+        y = y.astype(np.int32)
+        net = self.classif(NeuralNet, X_mm, y)
+        assert net.predict(X_mm).shape == y.shape
+
+    def test_classif_memmap_y(self, NeuralNet, tmpdir):
+        from nolearn.lasagne import BatchIterator
+        X, y = make_classification()
+        y_mm = np.memmap(
+            str(tmpdir.join('y.mm')), dtype=np.int32, mode='w+',
+            shape=y.shape)
+        y_mm[:] = y
+        X = X.astype(floatX)
+        l = InputLayer(shape=(None, X.shape[1]))
+        l = DenseLayer(l, num_units=len(np.unique(y)), nonlinearity=softmax)
+        net = NeuralNet(
+            l, update_learning_rate=0.01,
+            batch_iterator_train=BatchIterator(16, shuffle=True),
+            max_epochs=2,
+            )
+        net.fit(X, y_mm)
+        assert net.predict(X).shape == y.shape
+
+    def test_classif_no_copy_split(self, NeuralNet):
+        from nolearn.lasagne import BatchIterator
+        from nolearn.lasagne import TrainSplit
+        X, y = make_classification()
+        X = X.astype(floatX)
+        y = y.astype(np.int32)
+        l = InputLayer(shape=(None, X.shape[1]))
+        l = DenseLayer(l, num_units=len(np.unique(y)), nonlinearity=softmax)
+        net = NeuralNet(
+            l, update_learning_rate=0.01,
+            train_split=TrainSplit(0.2, copy=False),
+            batch_iterator_train=BatchIterator(16, shuffle=True),
+            max_epochs=2,
+            )
+        X_orig = X.copy()
+        net.fit(X, y)
+        np.testing.assert_equal(X, X_orig)
+        assert len(net.train_history_) == 2
+
+    def test_classif_custom_scores(self, NeuralNet):
+        from nolearn.lasagne import BatchIterator
+        X, y = make_classification(n_samples=200)
+        X = X.astype(floatX)
+        y = y.astype(np.int32)
+        l = InputLayer(shape=(None, X.shape[1]))
+        l = DenseLayer(l, num_units=2, nonlinearity=softmax)
+        net = NeuralNet(
+            l, update_learning_rate=0.01,
+            # Every validation batch has the same size:
+            batch_iterator_test=BatchIterator(20),
+            scores_valid=[('valid_max', lambda yp, yt: yp[0].max())],
+            custom_scores=[('acc', lambda yt, yp: accuracy_score(
+                yt, yp.argmax(1)))],
+            max_epochs=1,
+            )
+        net.fit(X, y)
+
+        # Custom scores reuse the predictions made by eval_iter_:
+        assert net.predict_iter_.func is None
+        info = net.train_history_[-1]
+        assert np.allclose(info['acc'], info['valid_accuracy'])
+        assert 0 < info['valid_max'] <= 1
+
+    def test_classif_custom_scores_per_epoch(self, NeuralNet):
+        from nolearn.lasagne import BatchIterator
+        from nolearn.lasagne import TrainSplit
+        X, y = make_classification(n_samples=200)
+        X = X.astype(floatX)
+        y = y.astype(np.int32)
+        calls = []
+
+        def f1(y_true, y_prob):
+            calls.append(len(y_true))
+            return f1_score(y_true, y_prob.argmax(1))
+
+        l = InputLayer(shape=(None, X.shape[1]))
+        l = DenseLayer(l, num_units=2, nonlinearity=softmax)
+        net = NeuralNet(
+            l, update_learning_rate=0.01,
+            train_split=TrainSplit(0.25),
+            batch_iterator_test=BatchIterator(16),
+            custom_scores=[('f1', f1)],
+            custom_scores_per_epoch=True,
+            max_epochs=2,
+            )
+        net.fit(X, y)
+
+        assert calls == [50, 50]
+        X_train, X_valid, y_train, y_valid = net.train_split(X, y, net)
+        assert np.isclose(
+            net.train_history_[-1]['f1'],
+            f1_score(y_valid, net.predict(X_valid)))
+
     def test_regr_one_target(self, NeuralNet):
         X, y = make_regression()
         X = X.astype(floatX)
@@ -125,6 +227,7 @@ class TestFunctionalMNIST:
         assert set(history[0].keys()) == set([
             'dur', 'epoch', 'train_loss', 'train_loss_best',
             'valid_loss', 'valid_loss_best', 'valid_accuracy',
+            'valid_fresh', 'timing',
             ])
 
     def test_early_stopping(self, net_fitted):
@@ -418,6 +521,57 @@ class TestTrainSplit:
         assert len(X_train['1']) == len(X_train['2']) == len(y_train) == 100
         assert len(X_valid['1']) == len(X_valid['2']) == len(y_valid) == 0
 
+    @pytest.mark.parametrize('stratify', [True, False])
+    def test_no_copy(self, TrainSplit, nn, stratify):
+        from nolearn.lasagne.base import _IndexView
+        X = {
+            '1': np.random.random((100, 10)),
+            '2': np.random.random((100, 10)),
+            }
+        y = np.repeat([0, 1, 2, 3], 25)
+        X_train, X_valid, y_train, y_valid = TrainSplit(
+            0.2, stratify=stratify, copy=False)(X, y, nn)
+
+        X_train2, X_valid2, y_train2, y_valid2 = TrainSplit(
+            0.2, stratify=stratify)(X, y, nn)
+
+        for view, copy, orig in (
+                (X_train['1'], X_train2['1'], X['1']),
+                (X_valid['2'], X_valid2['2'], X['2']),
+                (y_train, y_train2, y),
+                (y_valid, y_valid2, y),
+                ):
+            assert isinstance(view, _IndexView)
+            assert view.data is orig
+            assert view.shape == copy.shape
+            np.testing.assert_equal(np.asarray(view), copy)
+            np.testing.assert_equal(view[3:7], copy[3:7])
+
+    @pytest.fixture
+    def X_memmap(self, tmpdir):
+        X = np.memmap(
+            str(tmpdir.join('X.mm')), dtype=floatX, mode='w+',
+            shape=(100, 10))
+        X[:] = np.arange(100).reshape(-1, 1)
+        X.flush()
+        return np.memmap(
+            str(tmpdir.join('X.mm')), dtype=floatX, mode='r',
+            shape=(100, 10))
+
+    @pytest.mark.parametrize('stratify', [True, False])
+    def test_X_is_memmap(self, TrainSplit, nn, X_memmap, stratify):
+        from nolearn.lasagne.base import _IndexView
+        y = np.repeat([0, 1, 2, 3], 25)
+        X_train, X_valid, y_train, y_valid = TrainSplit(
+            0.2, stratify=stratify)(X_memmap, y, nn)
+
+        for X_part, y_part in ((X_train, y_train), (X_valid, y_valid)):
+            assert isinstance(X_part, (np.memmap, _IndexView))
+            rows = np.asarray(X_part)[:, 0].astype(int)
+            np.testing.assert_equal(y[rows], y_part)
+        assert len(X_train) == len(y_train) == 80
+        assert len(X_valid) == len(y_valid) == 20
+
 
 class TestTrainTestSplitBackwardCompatibility:
     @pytest.fixture
@@ -467,7 +621,7 @@ class TestBatchIterator:
     def y(self):
         return np.arange(20)
 
-    @pytest.mark.parametrize("shuffle", [True, False])
+    @pytest.mark.parametrize("shuffle", [True, False, 'indices'])
     def test_simple_x_and_y(self, BatchIterator, X, y, shuffle):
         bi = BatchIterator(2, shuffle=shuffle)(X, y)
         batches = list(bi)
@@ -487,7 +641,7 @@ class TestBatchIterator:
             np.testing.assert_equal(X[:2], X0)
             np.testing.assert_equal(y[:2], y0)
 
-    @pytest.mark.parametrize("shuffle", [True, False])
+    @pytest.mark.parametrize("shuffle", [True, False, 'indices'])
     def test_simple_x_no_y(self, BatchIterator, X, shuffle):
         bi = BatchIterator(2, shuffle=shuffle)(X)
         batches = list(bi)
@@ -500,7 +654,7 @@ class TestBatchIterator:
         if shuffle is False:
             np.testing.assert_equal(X[:2], X0)
 
-    @pytest.mark.parametrize("shuffle", [True, False])
+    @pytest.mark.parametrize("shuffle", [True, False, 'indices'])
     def test_X_is_dict(self, BatchIterator, X_dict, shuffle):
         bi = BatchIterator(2, shuffle=shuffle)(X_dict)
         batches = list(bi)
@@ -526,6 +680,142 @@ class TestBatchIterator:
         X0, y0 = list(bi)[0]
         assert X0.base is X  # make sure X0 is a view
 
+    def test_shuffle_indices_leaves_input_alone(self, BatchIterator, X, y):
+        X_orig, y_orig = X.copy(), y.copy()
+        X.flags.writeable = False
+        bi = BatchIterator(5, shuffle='indices')(X, y)
+        batches = list(bi)
+        np.testing.assert_equal(X, X_orig)
+        np.testing.assert_equal(y, y_orig)
+
+        yt = np.hstack([b[1] for b in batches])
+        assert not (yt == y).all()
+        assert sorted(yt) == list(y)
+        for Xb, yb in batches:
+            assert (np.diff(yb) > 0).all()  # sorted within batch
+
+    def test_memmap(self, BatchIterator, X, y, tmpdir):
+        from nolearn.lasagne.base import _IndexView
+        X_mm = np.memmap(
+            str(tmpdir.join('X.mm')), dtype=X.dtype, mode='w+',
+            shape=X.shape)
+        X_mm[:] = X
+        X_mm.flush()
+        X_mm = np.memmap(
+            str(tmpdir.join('X.mm')), dtype=X.dtype, mode='r',
+            shape=X.shape)
+
+        for X_in in (X_mm, _IndexView(X_mm, np.arange(len(X_mm)))):
+            batches = list(BatchIterator(3, shuffle=True)(X_in, y))
+            Xt = np.vstack([b[0] for b in batches])
+            yt = np.hstack([b[1] for b in batches])
+            np.testing.assert_equal(Xt[:, 0], yt)
+            assert not (yt == y).all()
+            np.testing.assert_equal(X_mm, X)
+
+    def test_memmap_y(self, BatchIterator, X, y, tmpdir):
+        y_mm = np.memmap(
+            str(tmpdir.join('y.mm')), dtype=y.dtype, mode='w+',
+            shape=y.shape)
+        y_mm[:] = y
+        y_mm.flush()
+        y_mm = np.memmap(
+            str(tmpdir.join('y.mm')), dtype=y.dtype, mode='r',
+            shape=y.shape)
+
+        X_orig = X.copy()
+        batches = list(BatchIterator(3, shuffle=True)(X, y_mm))
+        Xt = np.vstack([b[0] for b in batches])
+        yt = np.hstack([b[1] for b in batches])
+        np.testing.assert_equal(Xt[:, 0], yt)
+        assert not (yt == y).all()
+        np.testing.assert_equal(X, X_orig)
+
+    def test_shuffle_indices_new_order_every_call(self, BatchIterator, X, y):
+        bi = BatchIterator(5, shuffle='indices')
+        yb1 = list(bi(X, y))[0][1]
+        yb2 = list(bi(X, y))[0][1]
+        assert not np.all(yb1 == yb2)
+
+    @pytest.mark.parametrize("prefetch", [1, 3, 100])
+    def test_prefetch(self, BatchIterator, X, y, prefetch):
+        expected = list(BatchIterator(3)(X, y))
+        batches = list(BatchIterator(3, prefetch=prefetch)(X, y))
+        assert len(batches) == len(expected) == 7
+        for (Xb1, yb1), (Xb2, yb2) in zip(batches, expected):
+            np.testing.assert_equal(Xb1, Xb2)
+            np.testing.assert_equal(yb1, yb2)
+
+    def test_prefetch_transform_error(self, BatchIterator, X, y):
+        class MyBatchIterator(BatchIterator):
+            def transform(self, Xb, yb):
+                raise ValueError("augmentation failed")
+
+        bi = MyBatchIterator(2, prefetch=2)(X, y)
+        with pytest.raises(ValueError) as err:
+            list(bi)
+        assert str(err.value) == "augmentation failed"
+
+    def test_prefetch_transform_base_exception(self, BatchIterator, X, y):
+        class Interrupt(BaseException):
+            pass
+
+        class MyBatchIterator(BatchIterator):
+            def transform(self, Xb, yb):
+                raise Interrupt()
+
+        bi = MyBatchIterator(2, prefetch=2)(X, y)
+        with pytest.raises(Interrupt):
+            list(bi)
+
+    def test_prefetch_stop_early(self, BatchIterator, X, y):
+        bi = BatchIterator(2, prefetch=1)(X, y)
+        for i, (Xb, yb) in enumerate(bi):
+            if i == 1:
+                break
+        np.testing.assert_equal(Xb, X[2:4])
+        assert len(list(bi)) == 10
+
+    @pytest.fixture
+    def NoisyBatchIterator(self, BatchIterator):
+        class NoisyBatchIterator(BatchIterator):
+            def transform(self, Xb, yb):
+                return Xb + self.random.normal(size=Xb.shape), yb
+        return NoisyBatchIterator
+
+    def test_n_workers(self, BatchIterator, X, y):
+        expected = list(BatchIterator(3)(X, y))
+        batches = list(BatchIterator(3, n_workers=2)(X, y))
+        assert len(batches) == len(expected) == 7
+        for (Xb1, yb1), (Xb2, yb2) in zip(batches, expected):
+            np.testing.assert_equal(Xb1, Xb2)
+            np.testing.assert_equal(yb1, yb2)
+
+    def test_n_workers_reproducible(self, NoisyBatchIterator, X, y):
+        batches1 = list(NoisyBatchIterator(3, n_workers=2)(X, y))
+        batches2 = list(NoisyBatchIterator(3, n_workers=3)(X, y))
+        for (Xb1, yb1), (Xb2, yb2) in zip(batches1, batches2):
+            np.testing.assert_equal(Xb1, Xb2)
+            np.testing.assert_equal(yb1, yb2)
+        assert not np.allclose(batches1[0][0], X[:3])
+
+    def test_n_workers_with_prefetch(self, NoisyBatchIterator, X, y):
+        batches1 = list(NoisyBatchIterator(3, n_workers=2)(X, y))
+        batches2 = list(NoisyBatchIterator(
+            3, n_workers=2, prefetch=2)(X, y))
+        for (Xb1, yb1), (Xb2, yb2) in zip(batches1, batches2):
+            np.testing.assert_equal(Xb1, Xb2)
+
+    def test_n_workers_without_fork(self, BatchIterator, X, y):
+        expected = list(BatchIterator(3)(X, y))
+        with patch('nolearn.lasagne.base.multiprocessing.get_context',
+                   side_effect=ValueError, create=True):
+            batches = list(BatchIterator(3, n_workers=2)(X, y))
+        assert len(batches) == len(expected)
+        for (Xb1, yb1), (Xb2, yb2) in zip(batches, expected):
+            np.testing.assert_equal(Xb1, Xb2)
+            np.testing.assert_equal(yb1, yb2)
+
 
 class TestCheckForUnusedKwargs:
     def test_okay(self, NeuralNet):
@@ -790,6 +1080,44 @@ class TestGetOutput:
         expected = net_no_conv.predict_proba(X)
         np.testing.assert_equal(result, expected)
 
+    def test_many_layers(self, net_fitted, X_train):
+        X = X_train[:129]
+        layers = ['conv2', net_fitted.layers_[-1]]
+        conv2, output = net_fitted.get_output(layers, X)
+        np.testing.assert_equal(conv2, net_fitted.get_output('conv2', X))
+        np.testing.assert_equal(output, net_fitted.predict_proba(X))
+
+    def test_many_layers_compiled_once(self, net_fitted, X_train):
+        fn_cache = net_fitted._get_output_fn_cache
+        net_fitted.get_output(['conv1', 'conv2'], X_train[:3])
+        net_fitted.get_output(['conv1', 'conv2'], X_train[:3])
+        key = (net_fitted.layers_['conv1'], net_fitted.layers_['conv2'])
+        assert len([k for k in fn_cache if k == key]) == 1
+
+    def test_many_layers_out(self, net_fitted, X_train):
+        X = X_train[:129]
+        out = (np.zeros((129, 8, 8, 8), floatX), np.zeros((129, 10), floatX))
+        result = net_fitted.get_output(['conv2', 'output'], X, out=out)
+        assert np.shares_memory(result[0], out[0])
+        np.testing.assert_equal(out[1], net_fitted.predict_proba(X))
+
+    def test_iter_get_output(self, net_fitted, X_train):
+        batches = list(net_fitted.iter_get_output(['conv2'], X_train[:129]))
+        assert len(batches) == 2
+        assert [len(conv2) for conv2, in batches] == [128, 1]
+
+        batches = list(net_fitted.iter_get_output('conv2', X_train[:129]))
+        assert [len(conv2) for conv2 in batches] == [128, 1]
+
+    def test_one_layer_in_list(self, net_fitted, X_train):
+        X = X_train[:3]
+        conv2 = net_fitted.get_output('conv2', X)
+        assert isinstance(conv2, np.ndarray)
+        result = net_fitted.get_output(['conv2'], X)
+        assert isinstance(result, tuple)
+        assert len(result) == 1
+        np.testing.assert_equal(result[0], conv2)
+
 
 class TestMultiInputFunctional:
     @pytest.fixture(scope='session')
@@ -914,3 +1242,826 @@ class TestMultiOutput:
         p_cls, p_reg = mo_net.predict(dummy_data)
         assert(p_cls.shape == (2, 10))
         assert(p_reg.shape == (2, 1))
+
+    def test_predict_proba_out(self, mo_net):
+        dummy_data = np.zeros((3, 1, 28, 28), np.float32)
+        out = np.zeros((3, 10), floatX), np.zeros((3, 1), floatX)
+        p_cls, p_reg = mo_net.predict_proba(dummy_data, out=out)
+        assert np.may_share_memory(p_cls, out[0])
+        expected = mo_net.predict_proba(dummy_data)
+        np.testing.assert_allclose(out[0], expected[0])
+        np.testing.assert_allclose(out[1], expected[1])
+
+
+class TestCompileCache:
+    @pytest.fixture
+    def cache(self, tmpdir):
+        return str(tmpdir.join('cache'))
+
+    @pytest.fixture
+    def compile_all(self, data):
+        # Functions are compiled lazily; use all three of them:
+        def compile_all(net):
+            net.fit(*data)
+            net.predict_proba(data[0])
+            return net
+        return compile_all
+
+    def test_miss_then_hit(self, make_net, cache, compile_all, data, tmpdir,
+                           capsys):
+        X, y = data
+        net1 = compile_all(make_net(compile_cache=cache, verbose=1))
+        assert len(tmpdir.join('cache').listdir()) == 3
+        assert capsys.readouterr()[0].count("Compiled function") == 3
+
+        net2 = make_net(compile_cache=cache, verbose=1)
+        with patch('nolearn.lasagne.base.theano.function') as function:
+            compile_all(net2)
+        assert function.call_count == 0
+        assert capsys.readouterr()[0].count("Loaded compiled function") == 3
+
+        net2.load_params_from(net1)
+        np.testing.assert_allclose(
+            net1.predict_proba(X), net2.predict_proba(X), rtol=1e-5)
+
+    def test_values_not_saved(self, make_net, cache, compile_all, tmpdir):
+        net = compile_all(make_net(compile_cache=cache))
+        for path in tmpdir.join('cache').listdir():
+            with open(str(path), 'rb') as f:
+                func, shared = pickle.load(f)
+            for var in shared:
+                assert var.get_value().size <= 1
+        assert net.get_all_params_values()['dense1'][0].shape == (20, 8)
+
+    def test_hit_uses_own_params(self, make_net, cache, data):
+        X, y = data
+        net1 = make_net(compile_cache=cache)
+        net1.initialize()
+        net2 = make_net(compile_cache=cache)
+
+        params1 = net1.get_all_params_values()
+        net2.fit(X, y)
+        params2 = net2.get_all_params_values()
+        for key in params1:
+            for p1, p1_after in zip(
+                    params1[key], net1.get_all_params_values()[key]):
+                np.testing.assert_equal(p1, p1_after)
+            for p1, p2 in zip(params1[key], params2[key]):
+                assert not np.allclose(p1, p2)
+
+    def test_different_architecture_misses(self, make_net, cache, compile_all,
+                                           tmpdir):
+        compile_all(make_net(compile_cache=cache, num_hidden=0))
+        compile_all(make_net(compile_cache=cache))
+        assert len(tmpdir.join('cache').listdir()) == 6
+
+    def test_different_shapes_hit(self, make_net, cache, data, tmpdir):
+        # Compiled functions don't depend on the shapes of parameters
+        X, y = data
+        net = make_net(compile_cache=cache, num_hidden=10)
+        net.initialize()
+        net.predict_proba(X)
+        net = make_net(compile_cache=cache, num_hidden=12)
+        net.initialize()
+        with patch('nolearn.lasagne.base.theano.function') as function:
+            assert net.predict_proba(X).shape == (len(X), 2)
+        assert function.call_count == 0
+
+
+class TestLazyCompilation:
+    @pytest.fixture
+    def net(self, make_net):
+        return make_net(max_epochs=1)
+
+    def compiled(self, function):
+        return [call[1]['name'] for call in function.call_args_list]
+
+    def test_initialize_compiles_nothing(self, net):
+        with patch('nolearn.lasagne.base.theano.function') as function:
+            net.initialize()
+        assert function.call_count == 0
+
+    def test_predict_only(self, net, data):
+        X, y = data
+        with patch('nolearn.lasagne.base.theano.function',
+                   wraps=theano.function) as function:
+            net.initialize()
+            net.predict_proba(X)
+            net.predict_proba(X)
+        assert self.compiled(function) == ['predict_iter']
+
+    def test_fit(self, net, data):
+        X, y = data
+        with patch('nolearn.lasagne.base.theano.function',
+                   wraps=theano.function) as function:
+            net.fit(X, y)
+            net.fit(X, y)
+        assert self.compiled(function) == ['train_iter', 'eval_iter']
+
+    def test_pickle_before_first_use(self, net, data):
+        X, y = data
+        net.initialize()
+        net2 = pickle.loads(pickle.dumps(net, -1))
+        net2.fit(X, y)
+        assert len(net2.train_history_) == 1
+
+    def test_load_for_inference(self, net, data, tmpdir):
+        X, y = data
+        net.fit(X, y)
+        y_proba = net.predict_proba(X)
+        fname = str(tmpdir.join('net.pickle'))
+        with open(fname, 'wb') as f:
+            pickle.dump(net, f, -1)
+
+        with patch('nolearn.lasagne.base.theano.function',
+                   wraps=theano.function) as function:
+            net2 = net.__class__.load_for_inference(fname)
+            np.testing.assert_allclose(
+                net2.predict_proba(X), y_proba, rtol=1e-5)
+        assert self.compiled(function) == ['predict_iter']
+        assert net2.train_iter_.func is None
+        assert theano.config.unpickle_function
+
+        net2.fit(X, y)
+        assert len(net2.train_history_) == 2
+
+    def test_load_for_inference_wrong_type(self, NeuralNet, tmpdir):
+        fname = str(tmpdir.join('params.pickle'))
+        with open(fname, 'wb') as f:
+            pickle.dump({'a': 1}, f, -1)
+        with pytest.raises(ValueError):
+            NeuralNet.load_for_inference(fname)
+
+
+class TestFillBuffers:
+    def test_grows(self):
+        from nolearn.lasagne.base import _fill_buffers
+        buffers = _fill_buffers(None, [np.arange(3), np.ones((3, 2))], 0, 4)
+        assert [len(buf) for buf in buffers] == [4, 4]
+        buffers = _fill_buffers(
+            buffers, [np.arange(3, 6), np.zeros((3, 2))], 3, 4)
+        np.testing.assert_equal(buffers[0][:6], np.arange(6))
+        np.testing.assert_equal(buffers[1][:6, 0], [1, 1, 1, 0, 0, 0])
+
+
+class TestWeightedMean:
+    def test_scalars(self):
+        from nolearn.lasagne.base import _WeightedMean
+        mean = _WeightedMean()
+        mean.add([np.array(1.), np.float32(2.)], 3)
+        mean.add([np.array(3.), np.float32(4.)], 1)
+        np.testing.assert_allclose(mean.mean(), [1.5, 2.5])
+
+    def test_arrays(self):
+        from nolearn.lasagne.base import _WeightedMean
+        mean = _WeightedMean()
+        mean.add([np.array(1.), np.array([1., 3.])], 1)
+        mean.add([np.array(3.), np.array([3., 5.])], 1)
+        np.testing.assert_allclose(mean.mean(), [2., 3.])
+
+    def test_empty(self):
+        from nolearn.lasagne.base import _WeightedMean
+        assert _WeightedMean().mean() == []
+
+
+class TestTrainStepsPerCall:
+    def test_same_as_single_steps(self, make_net, data):
+        X, y = data
+        scores_train = [('max', lambda yp, yt: yp[0].max())]
+        net1 = make_net(scores_train=scores_train)
+        net1.initialize()
+        batches = []
+        net3 = make_net(
+            scores_train=scores_train,
+            train_steps_per_call=3,
+            on_batch_finished=[lambda nn, history: batches.append(1)],
+            )
+        net3.initialize()
+        net3.load_params_from(net1)
+
+        net1.fit(X, y)
+        with patch('nolearn.lasagne.base.theano.scan',
+                   wraps=theano.scan) as scan:
+            net3.fit(X, y)
+
+        assert scan.call_count == 1
+        # 160 training samples, i.e. 10 batches in every epoch:
+        assert len(batches) == 20
+        for key in ('train_loss', 'max', 'valid_loss'):
+            np.testing.assert_allclose(
+                [row[key] for row in net1.train_history_],
+                [row[key] for row in net3.train_history_],
+                rtol=1e-4)
+        for p1, p3 in zip(net1.get_all_params_values().values(),
+                          net3.get_all_params_values().values()):
+            for v1, v3 in zip(p1, p3):
+                np.testing.assert_allclose(v1, v3, rtol=1e-4, atol=1e-6)
+
+    def test_group_batches(self):
+        from nolearn.lasagne.base import _group_batches
+        batches = [(np.zeros((2, 1)), None)] * 4 + [(np.zeros((1, 1)), None)]
+        groups = list(_group_batches(batches, 3))
+        assert [len(group) for group in groups] == [3, 1, 1]
+
+
+class TestSharedData:
+    @pytest.mark.parametrize('chunk_size', [None, 48])
+    def test_same_as_without(self, make_net, data, chunk_size):
+        X, y = data
+        custom_scores = [('acc', lambda yt, yp: accuracy_score(
+            yt, yp.argmax(1)))]
+        net1 = make_net(custom_scores=custom_scores)
+        net1.initialize()
+        net2 = make_net(
+            custom_scores=custom_scores,
+            shared_data=True,
+            shared_data_chunk_size=chunk_size,
+            )
+        net2.initialize()
+        net2.load_params_from(net1)
+
+        net1.fit(X, y)
+        net2.fit(X, y)
+
+        for key in ('train_loss', 'valid_loss', 'valid_accuracy', 'acc'):
+            np.testing.assert_allclose(
+                [row[key] for row in net1.train_history_],
+                [row[key] for row in net2.train_history_],
+                rtol=1e-4)
+        assert net2.train_iter_.func is None
+        assert len(net2.shared_train_['y'].get_value()) == 0
+
+    def test_compile_cache(self, make_net, make_data, data, tmpdir):
+        X, y = data
+        X2, y2 = make_data(random_state=1)
+        cache = str(tmpdir.join('cache'))
+        net0 = make_net()
+        net0.initialize()
+        make_net(shared_data=True, compile_cache=cache).fit(X, y)
+
+        net1 = make_net(shared_data=True)
+        net2 = make_net(shared_data=True, compile_cache=cache)
+        for net in (net1, net2):
+            net.initialize()
+            net.load_params_from(net0)
+            net.fit(X2, y2)
+        for key in ('train_loss', 'valid_loss'):
+            np.testing.assert_allclose(
+                [row[key] for row in net1.train_history_],
+                [row[key] for row in net2.train_history_],
+                rtol=1e-4)
+
+    def test_shuffle(self, make_net, data):
+        from nolearn.lasagne import BatchIterator
+        X, y = data
+        net = make_net(
+            shared_data=True,
+            batch_iterator_train=BatchIterator(16, shuffle=True))
+        net.fit(X, y)
+        assert len(net.train_history_) == 2
+
+    def test_transform_not_allowed(self, make_net, data):
+        from nolearn.lasagne import BatchIterator
+
+        class MyBatchIterator(BatchIterator):
+            def transform(self, Xb, yb):
+                return Xb * 2, yb
+
+        net = make_net(
+            shared_data=True, batch_iterator_train=MyBatchIterator(16))
+        with pytest.raises(ValueError):
+            net.fit(*data)
+
+    def test_released_after_error(self, make_net, data):
+        def broken(nn, history):
+            raise ZeroDivisionError()
+
+        net = make_net(shared_data=True, on_epoch_finished=[broken])
+        with pytest.raises(ZeroDivisionError):
+            net.fit(*data)
+        for name in ('train', 'valid'):
+            storage = getattr(net, 'shared_{}_'.format(name))
+            for var in storage.values():
+                assert var.get_value().size == 0
+        assert net._shared_loaded == {}
+
+
+class TestGradAccumulation:
+    def test_same_as_large_batches(self, make_net, data):
+        X, y = data
+        net1 = make_net(batch_size=64, update_learning_rate=0.1)
+        net1.initialize()
+        net2 = make_net(
+            batch_size=16, update_learning_rate=0.1,
+            grad_accumulation_steps=4)
+        net2.initialize()
+        net2.load_params_from(net1)
+
+        net1.fit(X, y)
+        net2.fit(X, y)
+
+        # 160 training samples: batches of 64, 64, and 32 samples
+        for key in ('train_loss', 'valid_loss'):
+            np.testing.assert_allclose(
+                [row[key] for row in net1.train_history_],
+                [row[key] for row in net2.train_history_],
+                rtol=1e-4)
+        for p1, p2 in zip(net1.get_all_params_values().values(),
+                          net2.get_all_params_values().values()):
+            for v1, v2 in zip(p1, p2):
+                np.testing.assert_allclose(v1, v2, rtol=1e-4, atol=1e-6)
+
+    def test_not_with_shared_data(self, make_net, data):
+        net = make_net(grad_accumulation_steps=4, shared_data=True)
+        with pytest.raises(ValueError) as excinfo:
+            net.fit(*data)
+        assert "'shared_data' and 'grad_accumulation_steps'" in str(
+            excinfo.value)
+
+
+class TestParallelTraining:
+    @pytest.mark.parametrize('n_samples, n_jobs', [
+        (200, 2),  # equally sized shards
+        (210, 3),  # shards of different sizes
+        (205, 5),  # one of the last batch's shards is empty
+        ])
+    def test_same_as_single_process(self, make_net, make_data, n_samples,
+                                    n_jobs):
+        # With SGD, averaging the parameters weighted by the size of
+        # the shards after every step is the same as one step on the
+        # whole batch:
+        from lasagne.updates import sgd
+        X, y = make_data(n_samples=n_samples)
+        batches1, batches2 = [], []
+        net1 = make_net(
+            update=sgd,
+            update_learning_rate=0.1,
+            on_batch_finished=[lambda nn, history: batches1.append(1)],
+            )
+        net1.initialize()
+        net2 = make_net(
+            update=sgd,
+            update_learning_rate=0.1,
+            n_jobs=n_jobs,
+            on_batch_finished=[lambda nn, history: batches2.append(1)],
+            )
+        net2.initialize()
+        net2.load_params_from(net1)
+
+        net1.fit(X, y)
+        net2.fit(X, y)
+
+        assert len(batches2) == len(batches1)
+        for key in ('train_loss', 'valid_loss'):
+            np.testing.assert_allclose(
+                [row[key] for row in net1.train_history_],
+                [row[key] for row in net2.train_history_],
+                rtol=1e-4)
+        for p1, p2 in zip(net1.get_all_params_values().values(),
+                          net2.get_all_params_values().values()):
+            for v1, v2 in zip(p1, p2):
+                np.testing.assert_allclose(v1, v2, rtol=1e-4, atol=1e-6)
+
+    def test_sync_every(self, make_net, data):
+        X, y = data
+        net = make_net(n_jobs=3, parallel_sync_every=3)
+        net.fit(X, y)
+        assert len(net.train_history_) == 2
+        assert np.isfinite(net.train_history_[-1]['valid_loss'])
+
+    def test_hyperparams_sent_to_workers(self, make_net, data):
+        from lasagne.updates import sgd
+        X, y = data
+        params = []
+
+        def stop_learning(nn, history):
+            if not params:
+                nn.update_learning_rate.set_value(np.cast[floatX](0.))
+                params.append(nn.get_all_params_values())
+
+        net = make_net(
+            update=sgd,
+            update_learning_rate=theano.shared(np.cast[floatX](0.1)),
+            n_jobs=2,
+            max_epochs=1,
+            on_batch_finished=[stop_learning],
+            )
+        net.fit(X, y)
+        for p1, p2 in zip(params[0].values(),
+                          net.get_all_params_values().values()):
+            for v1, v2 in zip(p1, p2):
+                np.testing.assert_allclose(v1, v2)
+
+
+class TestAsyncValidation:
+    def fit_both(self, make_net, data, on_epoch_finished):
+        from lasagne.updates import sgd
+        X, y = data
+        seen = [], []
+        nets = []
+        for values, async_validation in zip(seen, (False, True)):
+            def remember(nn, history, values=values):
+                values.append(nn.get_all_params_values())
+                return on_epoch_finished(nn, history)
+            net = make_net(
+                update=sgd,
+                update_learning_rate=0.1,
+                max_epochs=4,
+                async_validation=async_validation,
+                on_epoch_finished=[remember],
+                )
+            net.initialize()
+            if nets:
+                net.load_params_from(nets[0])
+            nets.append(net)
+        for net in nets:
+            net.fit(X, y)
+        return nets, seen
+
+    def assert_params_equal(self, values1, values2):
+        for p1, p2 in zip(values1.values(), values2.values()):
+            for v1, v2 in zip(p1, p2):
+                np.testing.assert_allclose(v1, v2, rtol=1e-5, atol=1e-7)
+
+    def test_same_as_sync(self, make_net, data):
+        nets, seen = self.fit_both(
+            make_net, data, lambda nn, history: None)
+        net1, net2 = nets
+
+        assert len(net2.train_history_) == 4
+        for key in ('epoch', 'train_loss', 'valid_loss', 'valid_accuracy',
+                    'valid_loss_best'):
+            np.testing.assert_allclose(
+                [row[key] for row in net1.train_history_],
+                [row[key] for row in net2.train_history_],
+                rtol=1e-5)
+        # The handlers saw the parameters of the epoch they were
+        # called for, not those of the one trained in the meantime:
+        for values1, values2 in zip(*seen):
+            self.assert_params_equal(values1, values2)
+        self.assert_params_equal(
+            net1.get_all_params_values(), net2.get_all_params_values())
+
+    def test_stop_early(self, make_net, data):
+        def stop(nn, history):
+            if len(history) == 2:
+                raise StopIteration()
+
+        nets, seen = self.fit_both(make_net, data, stop)
+        net1, net2 = nets
+        assert len(net2.train_history_) == 2
+        self.assert_params_equal(
+            net1.get_all_params_values(), net2.get_all_params_values())
+
+    def test_worker_error(self, make_net, data):
+        def broken_score(y_true, y_prob):
+            raise ZeroDivisionError()
+
+        X, y = data
+        net = make_net(
+            async_validation=True,
+            custom_scores=[('broken', broken_score)],
+            )
+        with pytest.raises(RuntimeError) as excinfo:
+            net.fit(X, y)
+        assert 'ZeroDivisionError' in str(excinfo.value)
+
+    def test_batch_iterator_with_workers(self, make_net, data):
+        from nolearn.lasagne import BatchIterator
+        net = make_net(
+            async_validation=True,
+            batch_iterator_test=BatchIterator(16, n_workers=2),
+            )
+        net.fit(*data)
+        assert np.isfinite(net.train_history_[-1]['valid_loss'])
+
+
+class TestValidateEvery:
+    @pytest.mark.parametrize('async_validation', [False, True])
+    def test_validate_every(self, make_net, data, async_validation):
+        X, y = data
+        net = make_net(
+            num_hidden=0, max_epochs=5,
+            validate_every=3, async_validation=async_validation,
+            scores_valid=[('my_loss', lambda y_pred, y: T.mean(y_pred))],
+            )
+        net.fit(X, y)
+        history = net.train_history_
+        assert [row['valid_fresh'] for row in history] == [
+            False, False, True, False, True]
+        for row in history:
+            assert np.isnan(row['valid_loss']) != row['valid_fresh']
+            assert np.isnan(row['my_loss']) != row['valid_fresh']
+            assert np.isfinite(row['train_loss'])
+        assert history[2]['valid_loss_best']
+        for row in history:
+            if not row['valid_fresh']:
+                assert row['valid_loss_best'] is False
+
+    @pytest.mark.parametrize('async_validation', [False, True])
+    def test_valid_subsample(self, make_net, data, async_validation):
+        def num_samples(y_true, y_prob):
+            return len(y_true)
+
+        X, y = data
+        net = make_net(
+            num_hidden=0, valid_subsample=0.25, max_epochs=3,
+            async_validation=async_validation,
+            custom_scores=[('num_samples', num_samples)],
+            custom_scores_per_epoch=True,
+            )
+        net.fit(X, y)
+        assert [row['num_samples'] for row in net.train_history_] == [
+            10, 10, 40]
+
+    def test_subsample_is_fixed(self, make_net, data):
+        X, y = data
+        net = make_net(num_hidden=0, valid_subsample=7)
+        X_sub1, y_sub1 = net._subsample_valid(X, y)
+        X_sub2, y_sub2 = net._subsample_valid(X, y)
+        assert len(y_sub1) == 7
+        np.testing.assert_equal(X_sub1, X_sub2)
+        np.testing.assert_equal(y_sub1, y_sub2)
+
+    @pytest.mark.parametrize('kwargs', [
+        {'validate_every': 0},
+        {'valid_subsample': 1.5},
+        ])
+    def test_bad_options(self, make_net, data, kwargs):
+        X, y = data
+        with pytest.raises(ValueError):
+            make_net(num_hidden=0, **kwargs).fit(X, y)
+
+
+class TestTiming:
+    def test_nested_phases(self):
+        from nolearn.lasagne.base import _Timer
+        timer = _Timer()
+        with patch('nolearn.lasagne.base.time') as time:
+            time.side_effect = [0., 1., 3., 7.]
+            with timer('outer'):
+                with timer('inner'):
+                    pass
+        assert timer.totals['inner'] == 2.
+        assert timer.totals['outer'] == 5.
+
+    @pytest.mark.parametrize('async_validation', [False, True])
+    def test_phases(self, make_net, make_data, async_validation):
+        import time
+        from nolearn.lasagne import BatchIterator
+
+        class SlowBatchIterator(BatchIterator):
+            def transform(self, Xb, yb):
+                time.sleep(0.01)
+                return Xb, yb
+
+        def slow_handler(nn, history):
+            time.sleep(0.01)
+
+        def slow_score(y_true, y_prob):
+            time.sleep(0.01)
+            return 0.
+
+        X, y = make_data(n_samples=100)
+        net = make_net(
+            num_hidden=0,
+            batch_iterator_train=SlowBatchIterator(batch_size=20),
+            custom_scores=[('slow', slow_score)],
+            on_batch_finished=[slow_handler],
+            on_epoch_finished=[slow_handler],
+            async_validation=async_validation,
+            )
+        net.fit(X, y)
+
+        for row in net.train_history_:
+            timing = row['timing']
+            assert timing['batch_train'] >= 0.04
+            assert timing['custom_scores'] >= 0.01
+            assert timing['train_iter'] > 0
+            assert timing['eval_iter'] > 0
+            assert timing['handlers']['slow_handler'] >= 0.05
+
+
+class TestProfile:
+    def test_profile(self, make_net, data):
+        X, y = data
+        net = make_net(num_hidden=0, max_epochs=1, profile=True)
+        net.fit(X, y)
+        net.predict_proba(X)
+        for name in ('train_iter_', 'eval_iter_', 'predict_iter_'):
+            assert getattr(net, name).profile.fct_callcount > 0
+
+    def test_no_profile(self, make_net, data):
+        X, y = data
+        net = make_net(num_hidden=0, max_epochs=1)
+        net.fit(X, y)
+        assert net.train_iter_.profile is None
+
+    def test_cached_separately(self, make_net, data, tmpdir):
+        X, y = data
+        cache = str(tmpdir.join('cache'))
+        make_net(num_hidden=0, max_epochs=1, compile_cache=cache).fit(X, y)
+        net = make_net(
+            num_hidden=0, max_epochs=1, compile_cache=cache, profile=True)
+        net.fit(X, y)
+        assert net.train_iter_.profile.fct_callcount > 0
+        assert len(tmpdir.join('cache').listdir()) == 4
+
+    def test_cache_hit(self, make_net, data, tmpdir):
+        X, y = data
+        cache = str(tmpdir.join('cache'))
+        make_net(
+            num_hidden=0, max_epochs=1, compile_cache=cache, profile=True,
+            ).fit(X, y)
+        net = make_net(
+            num_hidden=0, max_epochs=1, compile_cache=cache, profile=True)
+        with patch('nolearn.lasagne.base.theano.function') as function:
+            net.fit(X, y)
+        assert function.call_count == 0
+        assert net.train_iter_.profile.fct_callcount > 0
+        assert net.train_iter_.name == 'train_iter'
+
+
+class TestPredictProba:
+    @pytest.fixture(scope='class')
+    def net(self, make_net):
+        net = make_net(num_hidden=0, num_classes=3)
+        net.initialize()
+        return net
+
+    @pytest.fixture
+    def X(self):
+        return np.random.uniform(size=(50, 20)).astype(floatX)
+
+    def test_iter_predict_proba(self, net, X):
+        batches = list(net.iter_predict_proba(X))
+        assert [len(batch) for batch in batches] == [16, 16, 16, 2]
+        np.testing.assert_allclose(
+            np.vstack(batches), net.predict_proba(X), rtol=1e-6)
+
+    def test_preallocated(self, net, X):
+        with patch('nolearn.lasagne.base.np.vstack') as vstack:
+            y_prob = net.predict_proba(X)
+        assert vstack.call_count == 0
+        assert y_prob.shape == (50, 3)
+        np.testing.assert_allclose(y_prob.sum(axis=1), 1, rtol=1e-5)
+
+    def test_out_memmap(self, net, X, tmpdir):
+        out = np.memmap(str(tmpdir.join('out.npy')), dtype=floatX,
+                        mode='w+', shape=(50, 3))
+        y_prob = net.predict_proba(X, out=out)
+        np.testing.assert_allclose(out, net.predict_proba(X))
+        assert isinstance(y_prob, np.memmap)
+
+    def test_out_too_small(self, net, X):
+        with pytest.raises(ValueError):
+            net.predict_proba(X, out=np.zeros((40, 3), floatX))
+
+
+class TestParallelPredict:
+    @pytest.fixture
+    def X(self):
+        return np.random.uniform(size=(100, 20)).astype(floatX)
+
+    @pytest.mark.parametrize('n_jobs', [2, 3, 10])
+    def test_same_as_single_process(self, make_net, X, n_jobs):
+        net = make_net(num_hidden=0, num_classes=3, predict_n_jobs=n_jobs)
+        net.initialize()
+        y_prob = net.predict_proba(X)
+        net.predict_n_jobs = 1
+        np.testing.assert_allclose(y_prob, net.predict_proba(X), rtol=1e-6)
+
+    def test_out(self, make_net, X, tmpdir):
+        net = make_net(num_hidden=0, num_classes=3, predict_n_jobs=3)
+        net.initialize()
+        expected = net._predict_proba(X)
+        out = np.zeros((100, 3), floatX)
+        net.predict_proba(X, out=out)
+        np.testing.assert_allclose(out, expected, rtol=1e-6)
+
+        out = np.memmap(str(tmpdir.join('out.npy')), dtype=floatX,
+                        mode='w+', shape=(100, 3))
+        with patch('nolearn.lasagne.base.multiprocessing.RawArray') as raw:
+            net.predict_proba(X, out=out)
+        assert raw.call_count == 0
+        np.testing.assert_allclose(out, expected, rtol=1e-6)
+
+    def test_worker_error(self, make_net, X):
+        import os
+        from nolearn.lasagne import BatchIterator
+        pid = os.getpid()
+
+        class FailInWorker(BatchIterator):
+            def transform(self, Xb, yb):
+                if os.getpid() != pid:
+                    raise ZeroDivisionError()
+                return Xb, yb
+
+        net = make_net(
+            num_hidden=0, num_classes=3, predict_n_jobs=2,
+            batch_iterator_test=FailInWorker(batch_size=16),
+            )
+        net.initialize()
+        with pytest.raises(RuntimeError) as excinfo:
+            net.predict_proba(X)
+        assert 'ZeroDivisionError' in str(excinfo.value)
+
+    def test_batch_iterator_with_workers(self, make_net, X):
+        from nolearn.lasagne import BatchIterator
+        net = make_net(num_hidden=0, num_classes=3, predict_n_jobs=2)
+        net.initialize()
+        expected = net.predict_proba(X)
+        net.batch_iterator_test = BatchIterator(batch_size=16, n_workers=2)
+        np.testing.assert_allclose(net.predict_proba(X), expected, rtol=1e-6)
+
+    def test_not_used_for_training(self, make_net, X):
+        net = make_net(
+            num_hidden=0, num_classes=3, predict_n_jobs=2, pad_batches=True,
+            max_epochs=1,
+            )
+        with patch('nolearn.lasagne.base._ParallelTrainer') as trainer:
+            net.fit(X, np.arange(len(X)).astype(np.int32) % 3)
+        assert trainer.call_count == 0
+
+
+class TestPadBatches:
+    @pytest.fixture
+    def data(self, make_data):
+        # 72 training samples, and 18 for validation:
+        return make_data(n_samples=90)
+
+    def test_same_as_unpadded(self, make_net, data):
+        from lasagne.updates import sgd
+        X, y = data
+        net1 = make_net(update=sgd, update_learning_rate=0.1)
+        net2 = make_net(
+            update=sgd,
+            update_learning_rate=0.1,
+            pad_batches=True,
+            scores_valid=[('my_acc', lambda y_pred, y: T.mean(
+                T.eq(y_pred[0].argmax(axis=1), y)))],
+            custom_scores=[('num_samples', lambda y, y_prob: len(y_prob))],
+            )
+        net1.initialize()
+        net2.load_params_from(net1)
+        net1.fit(X, y)
+        net2.fit(X, y)
+
+        for key in ('train_loss', 'valid_loss', 'valid_accuracy'):
+            np.testing.assert_allclose(
+                [row[key] for row in net1.train_history_],
+                [row[key] for row in net2.train_history_],
+                rtol=1e-5)
+        for row in net2.train_history_:
+            assert row['my_acc'] == row['valid_accuracy']
+            # Validation has one batch of 16, and one of 2 samples:
+            assert row['num_samples'] == (16 * 16 + 2 * 2) / 18.
+        np.testing.assert_allclose(
+            net1.predict_proba(X), net2.predict_proba(X), rtol=1e-5)
+        np.testing.assert_allclose(
+            net1.get_output('dense1', X), net2.get_output('dense1', X),
+            rtol=1e-5)
+
+    def test_same_shape_in_every_call(self, make_net, data):
+        X, y = data
+        net = make_net(pad_batches=True)
+        net.initialize()
+        shapes = []
+        for name in ('train_iter_padded', 'eval_iter_padded'):
+            func = net._get_iter_func(name).compile()
+
+            def record(Xb, yb, num_samples, func=func):
+                shapes.append((len(Xb), len(yb)))
+                return func(Xb, yb, num_samples)
+            setattr(net, name + '_', record)
+        net.fit(X, y)
+        assert len(shapes) == 2 * (5 + 2)
+        assert set(shapes) == set([(16, 16)])
+
+    def test_regression(self, NeuralNet):
+        from lasagne.updates import sgd
+        from nolearn.lasagne import BatchIterator
+        X, y = make_regression(n_samples=50, n_features=5, n_targets=2)
+        X, y = X.astype(floatX), y.astype(floatX)
+        nets = []
+        for pad_batches in (False, True):
+            l = InputLayer(shape=(None, 5))
+            l = DenseLayer(l, num_units=2, nonlinearity=None)
+            nets.append(NeuralNet(
+                l, update=sgd, update_learning_rate=0.01, regression=True,
+                batch_iterator_train=BatchIterator(16),
+                pad_batches=pad_batches, max_epochs=2,
+                ))
+            nets[-1].initialize()
+        nets[1].load_params_from(nets[0])
+        for net in nets:
+            net.fit(X, y)
+        np.testing.assert_allclose(
+            [row['valid_loss'] for row in nets[0].train_history_],
+            [row['valid_loss'] for row in nets[1].train_history_],
+            rtol=1e-5)
+
+    def test_not_with_train_steps_per_call(self, make_net, data):
+        net = make_net(pad_batches=True, train_steps_per_call=2)
+        with pytest.raises(ValueError):
+            net.fit(*data)
@@ -0,0 +1,121 @@
+import pickle
+
+from lasagne.layers import Conv2DLayer
+from lasagne.layers import DenseLayer
+from lasagne.layers import DropoutLayer
+from lasagne.layers import InputLayer
+from lasagne.layers import MaxPool2DLayer
+from lasagne.layers import NonlinearityLayer
+from lasagne.nonlinearities import LeakyRectify
+from lasagne.nonlinearities import rectify
+from lasagne.nonlinearities import sigmoid
+from lasagne.nonlinearities import softmax
+from lasagne.nonlinearities import tanh
+import numpy as np
+import pytest
+import theano
+
+
+floatX = theano.config.floatX
+
+
+@pytest.fixture(scope='module')
+def X():
+    return np.random.RandomState(0).uniform(
+        -1, 1, size=(37, 2, 9, 11)).astype(floatX)
+
+
+@pytest.fixture
+def export_numpy():
+    from nolearn.lasagne import export_numpy
+    return export_numpy
+
+
+def make_net(NeuralNet, conv_kwargs=None, pool_kwargs=None, **kwargs):
+    l = InputLayer(shape=(None, 2, 9, 11))
+    l = Conv2DLayer(l, num_filters=3, filter_size=(3, 2),
+                    nonlinearity=LeakyRectify(0.1), **(conv_kwargs or {}))
+    l = MaxPool2DLayer(l, pool_size=2, **(pool_kwargs or {}))
+    l = DropoutLayer(l)
+    l = DenseLayer(l, num_units=5, nonlinearity=tanh)
+    l = DenseLayer(l, num_units=4, nonlinearity=None)
+    l = NonlinearityLayer(l, nonlinearity=softmax)
+    net = NeuralNet(l, update_learning_rate=0.01, **kwargs)
+    net.initialize()
+    return net
+
+
+class TestExportNumpy:
+    @pytest.mark.parametrize('conv_kwargs', [
+        {},
+        {'pad': 'same'},
+        {'pad': 'full'},
+        {'pad': 1, 'stride': (2, 1)},
+        {'untie_biases': True},
+        {'b': None},
+        ])
+    def test_conv(self, export_numpy, NeuralNet, X, conv_kwargs):
+        net = make_net(NeuralNet, conv_kwargs=conv_kwargs)
+        np.testing.assert_allclose(
+            export_numpy(net).predict_proba(X), net.predict_proba(X),
+            rtol=1e-4, atol=1e-6)
+
+    @pytest.mark.parametrize('pool_kwargs', [
+        {'stride': 1},
+        {'ignore_border': False},
+        {'pad': (1, 1)},
+        ])
+    def test_pool(self, export_numpy, NeuralNet, X, pool_kwargs):
+        net = make_net(NeuralNet, pool_kwargs=pool_kwargs)
+        np.testing.assert_allclose(
+            export_numpy(net).predict_proba(X), net.predict_proba(X),
+            rtol=1e-4, atol=1e-6)
+
+    def test_dropout_left_out(self, export_numpy, NeuralNet):
+        names = [name for name, layer in
+                 export_numpy(make_net(NeuralNet)).layers]
+        assert names == ['conv2d1', 'maxpool2d2', 'dense4', 'dense5',
+                         'nonlinearity6']
+
+    @pytest.mark.parametrize('nonlinearity', [rectify, sigmoid, softmax])
+    def test_dense(self, export_numpy, NeuralNet, nonlinearity):
+        l = InputLayer(shape=(None, 6))
+        l = DenseLayer(l, num_units=3, nonlinearity=nonlinearity)
+        net = NeuralNet(l, update_learning_rate=0.01)
+        X = np.random.uniform(size=(10, 6)).astype(floatX)
+        net.initialize()
+        np.testing.assert_allclose(
+            export_numpy(net).predict_proba(X), net.predict_proba(X),
+            rtol=1e-4, atol=1e-6)
+
+    def test_predict_with_label_encoder(self, export_numpy, NeuralNet, X):
+        net = make_net(NeuralNet, use_label_encoder=True, max_epochs=1)
+        y = np.array(['a', 'b', 'c', 'd'] * 10)[:len(X)]
+        net.fit(X, y)
+        np.testing.assert_equal(
+            export_numpy(net).predict(X), net.predict(X))
+
+    def test_regression(self, export_numpy, NeuralNet):
+        l = InputLayer(shape=(None, 6))
+        l = DenseLayer(l, num_units=1, nonlinearity=None)
+        net = NeuralNet(l, update_learning_rate=0.01, regression=True)
+        net.initialize()
+        X = np.random.uniform(size=(10, 6)).astype(floatX)
+        np.testing.assert_allclose(
+            export_numpy(net).predict(X), net.predict(X), rtol=1e-5)
+
+    def test_pickle(self, export_numpy, NeuralNet, X):
+        net = make_net(NeuralNet)
+        exported = pickle.loads(pickle.dumps(export_numpy(net), -1))
+        np.testing.assert_allclose(
+            exported.predict_proba(X), net.predict_proba(X),
+            rtol=1e-4, atol=1e-6)
+
+    def test_unsupported_layer(self, export_numpy, NeuralNet):
+        from lasagne.layers import FlattenLayer
+        l = InputLayer(shape=(None, 2, 3))
+        l = FlattenLayer(l)
+        l = DenseLayer(l, num_units=3)
+        net = NeuralNet(l, update_learning_rate=0.01)
+        with pytest.raises(ValueError):
+            export_numpy(net)
@@ -1,5 +1,6 @@
 from collections import OrderedDict
 import pickle
+import warnings
 
 from lasagne.layers import ConcatLayer
 from lasagne.layers import Conv2DLayer
@@ -73,6 +74,63 @@ def test_print_log(mnist):
         ]
 
 
+def test_print_log_not_validated():
+    from nolearn.lasagne import PrintLog
+
+    nn = Mock(
+        regression=False,
+        custom_scores=[('my1', 0.99)],
+        scores_train=[],
+        scores_valid=[],
+        )
+
+    train_history = [{
+        'epoch': 2,
+        'train_loss': 0.8,
+        'valid_loss': numpy.nan,
+        'train_loss_best': False,
+        'valid_loss_best': False,
+        'valid_accuracy': numpy.nan,
+        'valid_fresh': False,
+        'my1': numpy.nan,
+        'dur': 1.0,
+        }]
+    output = PrintLog().table(nn, train_history)
+    assert 'nan' not in output
+    assert output.split()[-3:] == ['2', '0.80000', '1.00s']
+
+
+def test_print_log_timing():
+    from nolearn.lasagne import PrintLog
+
+    nn = Mock(
+        regression=True,
+        custom_scores=None,
+        scores_train=[],
+        scores_valid=[],
+        verbose=3,
+        )
+
+    train_history = [{
+        'epoch': 1,
+        'train_loss': 0.8,
+        'valid_loss': 0.7,
+        'train_loss_best': False,
+        'valid_loss_best': False,
+        'dur': 1.0,
+        'timing': {
+            'batch_train': 0.5,
+            'train_iter': 0.25,
+            'handlers': {'a': 0.125, 'b': 0.125},
+            },
+        }]
+    output = PrintLog().table(nn, train_history)
+    assert output.split()[-4:] == ['1.00s', '0.50s', '0.25s', '0.25s']
+    assert output.split()[:7] == [
+        'epoch', 'trn', 'loss', 'val', 'loss', 'trn/val', 'dur']
+    assert output.split()[7:10] == ['batch_train', 'train_iter', 'handlers']
+
+
 class TestSaveWeights():
     @pytest.fixture
     def SaveWeights(self):
@@ -121,6 +179,33 @@ class TestSaveWeights():
         handler(nn, train_history)
         assert nn.save_params_to.call_count == 0
 
+    def test_only_best_not_validated(self, SaveWeights):
+        train_history = [
+            {'epoch': 9, 'valid_loss': 1.2, 'valid_fresh': True},
+            {'epoch': 10, 'valid_loss': float('nan'), 'valid_fresh': False},
+            ]
+        nn = Mock()
+        handler = SaveWeights('mypath', only_best=True)
+        handler(nn, train_history)
+        assert nn.save_params_to.call_count == 0
+
+        train_history.append(
+            {'epoch': 11, 'valid_loss': 1.1, 'valid_fresh': True})
+        handler(nn, train_history)
+        assert nn.save_params_to.call_count == 1
+
+    def test_only_best_no_validation_data(self, SaveWeights):
+        train_history = [
+            {'epoch': 9, 'valid_loss': float('nan')},
+            {'epoch': 10, 'valid_loss': float('nan')},
+            ]
+        nn = Mock()
+        handler = SaveWeights('mypath', only_best=True)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            handler(nn, train_history)
+        assert nn.save_params_to.call_count == 1
+
     def test_with_path_interpolation(self, SaveWeights):
         train_history = [{'epoch': 9, 'valid_loss': 1.1}]
         nn = Mock()
@@ -194,6 +279,46 @@ class TestRememberBestWeights:
         nn.load_params_from.assert_called_with(rbw.best_weights)
 
 
+class TestPrintProfile:
+    @pytest.fixture
+    def PrintProfile(self):
+        from nolearn.lasagne import PrintProfile
+        return PrintProfile
+
+    def test_print_profile(self, PrintProfile, NeuralNet):
+        from nolearn._compat import StringIO
+        from sklearn.datasets import make_classification
+        import theano
+        X, y = make_classification(n_samples=100, n_features=20)
+        nn = NeuralNet(
+            layers=[
+                ('input', InputLayer),
+                ('output', DenseLayer),
+                ],
+            input_shape=(None, 20),
+            output_num_units=2,
+            output_nonlinearity=softmax,
+            update_learning_rate=0.01,
+            max_epochs=1,
+            profile=True,
+            )
+        nn.fit(X.astype(theano.config.floatX), y.astype('int32'))
+
+        assert [name for name, profile in PrintProfile.get_profiles(nn)] == [
+            'eval_iter_', 'train_iter_']
+        out = StringIO()
+        PrintProfile(file=out)(nn)
+        assert "Function profiling" in out.getvalue()
+        assert "train_iter" in out.getvalue()
+
+    def test_no_profiles(self, PrintProfile):
+        from nolearn._compat import StringIO
+        nn = Mock(spec=[])
+        out = StringIO()
+        PrintProfile(file=out)(nn)
+        assert "profile=True" in out.getvalue()
+
+
 class TestPrintLayerInfo():
     @pytest.fixture(scope='session')
     def X_train(self, mnist):
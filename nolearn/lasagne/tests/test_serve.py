@@ -0,0 +1,136 @@
+import threading
+
+from lasagne.layers import DenseLayer
+from lasagne.layers import InputLayer
+from lasagne.nonlinearities import softmax
+import numpy as np
+import pytest
+import theano
+
+
+floatX = theano.config.floatX
+
+
+@pytest.fixture(scope='module')
+def net(NeuralNet):
+    from nolearn.lasagne import BatchIterator
+    l = InputLayer(shape=(None, 6))
+    l = DenseLayer(l, num_units=3, nonlinearity=softmax)
+    net = NeuralNet(
+        l,
+        update_learning_rate=0.01,
+        batch_iterator_test=BatchIterator(batch_size=8),
+        )
+    net.initialize()
+    return net
+
+
+@pytest.fixture
+def X():
+    return np.random.uniform(size=(20, 6)).astype(floatX)
+
+
+@pytest.fixture
+def MicroBatcher():
+    from nolearn.lasagne import MicroBatcher
+    return MicroBatcher
+
+
+def predict_concurrently(predict_proba, X):
+    results = [None] * len(X)
+
+    def predict(i):
+        results[i] = predict_proba(X[i:i + 1])
+
+    threads = [threading.Thread(target=predict, args=(i,))
+               for i in range(len(X))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.vstack(results)
+
+
+class TestMicroBatcher:
+    def test_batches(self, MicroBatcher, net, X):
+        with MicroBatcher(net, max_latency=0.2) as batcher:
+            y_prob = predict_concurrently(batcher.predict_proba, X)
+            stats = batcher.stats()
+
+        np.testing.assert_allclose(y_prob, net.predict_proba(X), rtol=1e-5)
+        assert stats['num_requests'] == 20
+        assert 3 <= stats['num_batches'] < 20
+        assert max(batcher.batch_sizes) <= 8
+        assert stats['batch_size_mean'] == 20. / stats['num_batches']
+        assert 0 < stats['latency_p50'] <= stats['latency_max']
+        assert stats['max_queue_depth'] > 1
+        assert stats['queue_depth'] == 0
+
+    def test_max_latency(self, MicroBatcher, net, X):
+        with MicroBatcher(net, max_latency=0.) as batcher:
+            for i in range(3):
+                batcher.predict_proba(X[i:i + 1])
+        assert batcher.num_batches == 3
+
+    def test_request_larger_than_batch(self, MicroBatcher, net, X):
+        with MicroBatcher(net) as batcher:
+            y_prob = batcher.predict_proba(X)
+        np.testing.assert_allclose(y_prob, net.predict_proba(X), rtol=1e-5)
+
+    def test_error(self, MicroBatcher, net, X):
+        with MicroBatcher(net, max_latency=0.2) as batcher:
+            good = batcher.submit(X[:2])
+            bad = batcher.submit(X[:2, :4])
+            np.testing.assert_allclose(
+                good.result(), net.predict_proba(X[:2]), rtol=1e-5)
+            with pytest.raises(Exception):
+                bad.result()
+
+    def test_stop_predicts_pending(self, MicroBatcher, net, X):
+        batcher = MicroBatcher(net, max_latency=10.).start()
+        request = batcher.submit(X[:1])
+        batcher.stop()
+        assert request.done.is_set()
+
+    def test_own_batch_iterator(self, MicroBatcher, net, X):
+        with MicroBatcher(net) as batcher:
+            net.batch_iterator_test.X = None
+            y_prob = batcher.predict_proba(X)
+            assert net.batch_iterator_test.X is None
+        np.testing.assert_allclose(y_prob, net.predict_proba(X), rtol=1e-5)
+
+
+class TestUnixServer:
+    @pytest.fixture
+    def server(self, MicroBatcher, net, tmpdir):
+        from nolearn.lasagne.serve import UnixServer
+        batcher = MicroBatcher(net, max_latency=0.05).start()
+        server = UnixServer(batcher, str(tmpdir.join('sock')))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+        thread.join()
+        batcher.stop()
+
+    def test_predict_proba(self, server, net, X):
+        from nolearn.lasagne.serve import UnixClient
+        clients = threading.local()
+
+        def predict_proba(X):
+            if not hasattr(clients, 'client'):
+                clients.client = UnixClient(server.server_address)
+            return clients.client.predict_proba(X)
+
+        y_prob = predict_concurrently(predict_proba, X)
+        np.testing.assert_allclose(y_prob, net.predict_proba(X), rtol=1e-5)
+        assert server.batcher.stats()['num_batches'] < 20
+
+    def test_error(self, server, X):
+        from nolearn.lasagne.serve import UnixClient
+        client = UnixClient(server.server_address)
+        with pytest.raises(RuntimeError):
+            client.predict_proba(X[:, :4])
+        assert client.predict_proba(X[:1]).shape == (1, 3)
+        client.close()
@@ -0,0 +1,205 @@
+"""A forward pass for trained networks that needs nothing but NumPy.
+
+Use :func:`nolearn.lasagne.export_numpy` to turn a trained
+:class:`nolearn.lasagne.NeuralNet` into a :class:`NumpyNet`.  This
+module doesn't import Theano or Lasagne, so a pickled
+:class:`NumpyNet` can be loaded and used on hosts that have neither.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+def _softmax(x):
+    e_x = np.exp(x - x.max(axis=1, keepdims=True))
+    return e_x / e_x.sum(axis=1, keepdims=True)
+
+
+def _sigmoid(x):
+    return 1. / (1. + np.exp(-x))
+
+
+def _softplus(x):
+    return np.logaddexp(0, x)
+
+
+def _elu(x):
+    return np.where(x > 0, x, np.expm1(np.minimum(x, 0)))
+
+
+NONLINEARITIES = {
+    'identity': lambda x: x,
+    'rectify': lambda x: np.maximum(x, 0),
+    'sigmoid': _sigmoid,
+    'softmax': _softmax,
+    'softplus': _softplus,
+    'tanh': np.tanh,
+    'elu': _elu,
+    }
+
+
+class Nonlinearity(object):
+    def __init__(self, name, leakiness=None):
+        """
+        :param name: One of the keys of :data:`NONLINEARITIES`, or
+                     ``'leaky_rectify'``.
+        :param leakiness: The slope for negative inputs when `name` is
+                          ``'leaky_rectify'``.
+        """
+        if name != 'leaky_rectify' and name not in NONLINEARITIES:
+            raise ValueError("Unknown nonlinearity: {}".format(name))
+        self.name = name
+        self.leakiness = leakiness
+
+    def __call__(self, X):
+        if self.name == 'leaky_rectify':
+            return np.where(X > 0, X, X * self.leakiness)
+        return NONLINEARITIES[self.name](X)
+
+
+class Dense(object):
+    def __init__(self, W, b=None, nonlinearity=None):
+        self.W = W
+        self.b = b
+        self.nonlinearity = nonlinearity or Nonlinearity('identity')
+
+    def __call__(self, X):
+        out = X.reshape(len(X), -1).dot(self.W)
+        if self.b is not None:
+            out += self.b
+        return self.nonlinearity(out)
+
+
+def _windows(X, size, stride):
+    # A strided view of shape (N, C, out_h, out_w, size_h, size_w) of
+    # all windows in X, without copying anything:
+    n, c, h, w = X.shape
+    out_h = (h - size[0]) // stride[0] + 1
+    out_w = (w - size[1]) // stride[1] + 1
+    s0, s1, s2, s3 = X.strides
+    return as_strided(
+        X,
+        shape=(n, c, out_h, out_w, size[0], size[1]),
+        strides=(s0, s1, s2 * stride[0], s3 * stride[1], s2, s3),
+        )
+
+
+def _pad(X, pad, value=0):
+    if not any(pad):
+        return X
+    return np.pad(
+        X, ((0, 0), (0, 0), (pad[0], pad[0]), (pad[1], pad[1])),
+        mode='constant', constant_values=value)
+
+
+class Conv2D(object):
+    def __init__(self, W, b=None, stride=(1, 1), pad=(0, 0),
+                 nonlinearity=None, crop=None):
+        """
+        :param W: Filters of shape ``(num_filters, channels, height,
+                  width)``.  These are correlated with the input, i.e.
+                  not flipped.
+        :param b: Biases of shape ``(num_filters,)``, or untied biases
+                  of shape ``(num_filters, out_height, out_width)``.
+        :param crop: If given, the output is cropped to this
+                     ``(height, width)``, which is needed for ``'same'``
+                     padding with even filter sizes.
+        """
+        self.W = W
+        self.b = b
+        self.stride = tuple(stride)
+        self.pad = tuple(pad)
+        self.nonlinearity = nonlinearity or Nonlinearity('identity')
+        self.crop = crop
+
+    def __call__(self, X):
+        X = _pad(X, self.pad)
+        num_filters, channels, fh, fw = self.W.shape
+        cols = _windows(X, (fh, fw), self.stride)
+        n, _, out_h, out_w = cols.shape[:4]
+        # im2col: one row per output pixel, one column per filter
+        # weight; then the convolution is a single matrix product:
+        cols = cols.transpose(0, 2, 3, 1, 4, 5).reshape(
+            n * out_h * out_w, channels * fh * fw)
+        out = cols.dot(self.W.reshape(num_filters, -1).T)
+        out = out.reshape(n, out_h, out_w, num_filters).transpose(0, 3, 1, 2)
+        if self.crop is not None:
+            out = out[:, :, :self.crop[0], :self.crop[1]]
+        if self.b is not None:
+            if self.b.ndim == 1:
+                out = out + self.b[None, :, None, None]
+            else:
+                out = out + self.b[None]
+        return self.nonlinearity(out)
+
+
+class MaxPool2D(object):
+    def __init__(self, pool_size, stride=None, pad=(0, 0),
+                 ignore_border=True):
+        self.pool_size = tuple(pool_size)
+        self.stride = self.pool_size if stride is None else tuple(stride)
+        self.pad = tuple(pad)
+        self.ignore_border = ignore_border
+
+    def __call__(self, X):
+        # Padding is never part of the maximum:
+        X = _pad(X, self.pad, value=-np.inf)
+        if not self.ignore_border:
+            # Partial windows at the bottom and right border are
+            # included; extend X so that they're complete:
+            extra = []
+            for size, stride, length in zip(
+                    self.pool_size, self.stride, X.shape[2:]):
+                if stride >= size:
+                    out = (length - 1) // stride + 1
+                else:
+                    out = max(0, (length - 1 - size + stride) // stride) + 1
+                extra.append(max(0, (out - 1) * stride + size - length))
+            if any(extra):
+                X = np.pad(
+                    X, ((0, 0), (0, 0), (0, extra[0]), (0, extra[1])),
+                    mode='constant', constant_values=-np.inf)
+        return _windows(X, self.pool_size, self.stride).max(axis=(4, 5))
+
+
+class NumpyNet(object):
+    """A feed-forward network that's evaluated with NumPy only.
+
+    Each layer is a callable that takes and returns a batch of data.
+    """
+    def __init__(self, layers, batch_size=128, regression=False,
+                 classes=None, dtype=np.float32):
+        """
+        :param layers: A list of ``(name, layer)`` tuples.
+        :param batch_size: The number of samples to process at once.
+        :param regression: Whether :meth:`predict` returns the
+                           output of the network as is.
+        :param classes: If given, :meth:`predict` maps class indexes
+                        to these labels.
+        :param dtype: The dtype that input is converted to.
+        """
+        self.layers = layers
+        self.batch_size = batch_size
+        self.regression = regression
+        self.classes = classes
+        self.dtype = dtype
+
+    def forward(self, X):
+        for name, layer in self.layers:
+            X = layer(X)
+        return X
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=self.dtype)
+        return np.vstack([
+            self.forward(X[i:i + self.batch_size])
+            for i in range(0, len(X), self.batch_size)
+            ])
+
+    def predict(self, X):
+        if self.regression:
+            return self.predict_proba(X)
+        y_pred = np.argmax(self.predict_proba(X), axis=1)
+        if self.classes is not None:
+            y_pred = np.asarray(self.classes)[y_pred]
+        return y_pred